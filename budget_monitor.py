@@ -0,0 +1,127 @@
+from bisect import bisect_right
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class BudgetMonitor(QObject):
+    """
+    Represents the monitoring of the spending against the budgets.
+
+    The monitor keeps running totals per month and category, updated by the
+    changes reported by FinancialLogic, and emits threshold_crossed when the
+    spending reaches a new share of the monthly budget or of a category
+    budget. Every change only touches the totals of its own month and
+    category, so the month is never rescanned.
+    """
+
+    threshold_crossed = pyqtSignal(str, str, int, float, float)
+
+    def __init__(self, thresholds=(50, 80, 100)):
+        """
+        Initializes the BudgetMonitor class.
+
+        Args:
+            thresholds (tuple): The percentages of a budget that trigger a
+                notification (default: (50, 80, 100))
+        """
+        super().__init__()
+        self.thresholds = sorted(thresholds)
+        self.totals = {}
+        self.category_totals = {}
+        self.budgets = {}
+        self.category_budgets = {}
+        self.levels = {}
+
+    def load(self, data):
+        """Loads the totals and budgets without emitting notifications
+
+        Args:
+            data (dict): The expense data or its summary
+        """
+        for month, details in data.items():
+            self.totals[month] = details['totalSum']
+            self.category_totals[month] = {
+                category: expenses['sumOfAmounts']
+                for category, expenses in details['money'].items()}
+            self.budgets[month] = details['budget']
+            self.category_budgets[month] = dict(
+                details.get('categoryBudgets', {}))
+            self.levels[month, ''] = self.level(month, '')
+            for category in self.category_budgets[month]:
+                self.levels[month, category] = self.level(month, category)
+
+    def level(self, month, category):
+        """Get the number of thresholds reached by the spending
+
+        Args:
+            month (str): The month
+            category (str): The category, '' for the whole month
+
+        Returns:
+            int: the number of reached thresholds, 0 without a budget
+        """
+        if category:
+            budget = self.category_budgets.get(month, {}).get(category)
+            spent = self.category_totals.get(month, {}).get(category, 0.0)
+        else:
+            budget = self.budgets.get(month)
+            spent = self.totals.get(month, 0.0)
+        if not budget:
+            return 0
+        return bisect_right(self.thresholds, spent / budget * 100)
+
+    def check(self, month, category):
+        """Emits threshold_crossed if the spending reached a new threshold
+
+        A notification is emitted once per threshold; when the spending
+        drops below a threshold again, crossing it later notifies again.
+
+        Args:
+            month (str): The month
+            category (str): The category, '' for the whole month
+        """
+        level = self.level(month, category)
+        previous = self.levels.get((month, category), 0)
+        self.levels[month, category] = level
+        if level > previous:
+            if category:
+                budget = self.category_budgets[month][category]
+                spent = self.category_totals[month].get(category, 0.0)
+            else:
+                budget = self.budgets[month]
+                spent = self.totals[month]
+            self.threshold_crossed.emit(
+                month, category, self.thresholds[level - 1], spent, budget)
+
+    def observe(self, change):
+        """Updates the totals with a change reported by FinancialLogic
+
+        Args:
+            change (dict): The change as reported by FinancialLogic listeners
+        """
+        action, month, category = change['action'], change['month'], change['category']
+        if action == 'budget':
+            self.budgets[month] = change['expense']['budget']
+            self.check(month, '')
+            return
+        if action == 'category_budget':
+            budgets = self.category_budgets.setdefault(month, {})
+            if change['expense']['budget'] is None:
+                budgets.pop(category, None)
+            else:
+                budgets[category] = change['expense']['budget']
+            self.check(month, category)
+            return
+        if action not in ('add', 'edit', 'delete'):
+            return
+
+        amount = change['expense']['amount']
+        if action == 'delete':
+            amount = -amount
+        elif action == 'edit':
+            amount -= change['previous']['amount']
+        self.totals[month] = self.totals.get(month, 0.0) + amount
+        totals = self.category_totals.setdefault(month, {})
+        totals[category] = totals.get(category, 0.0) + amount
+        self.check(month, '')
+        if category in self.category_budgets.get(month, {}):
+            self.check(month, category)
@@ -0,0 +1,341 @@
+from collections import deque
+
+
+class Command:
+    """
+    Represents an invertible change of the expenses.
+
+    Subclasses implement apply() and revert() on top of the low-level
+    methods of FinancialLogic, which do not record anything in the history.
+    Each command stores only the data needed to invert itself, so undoing a
+    step does not search or copy the ledger. Saving the result still writes
+    the whole JSON file.
+    """
+
+    def __init__(self, month, category):
+        """
+        Initializes the Command class.
+
+        Args:
+            month (str): The month the command changes
+            category (str): The category the command changes
+        """
+        self.month = month
+        self.category = category
+
+    def apply(self, logic):
+        """Applies the command
+
+        Args:
+            logic (FinancialLogic): The logic to apply the command to
+        """
+        raise NotImplementedError
+
+    def revert(self, logic):
+        """Reverts the command
+
+        Args:
+            logic (FinancialLogic): The logic to revert the command on
+        """
+        raise NotImplementedError
+
+
+class AddExpenseCommand(Command):
+    """
+    Represents adding an expense to the end of a category.
+    """
+
+    def __init__(self, month, category, expense):
+        """
+        Initializes the AddExpenseCommand class.
+
+        Args:
+            month (str): The month of the expense
+            category (str): The category of the expense
+            expense (dict): The added expense
+        """
+        super().__init__(month, category)
+        self.expense = expense
+        self.index = None
+
+    def apply(self, logic):
+        logic.insert_expense(self.month, self.category, self.expense)
+        self.index = len(logic.expenses[self.category]['items']) - 1
+
+    def revert(self, logic):
+        logic.remove_expense(self.month, self.category, self.index)
+
+
+class EditExpenseCommand(Command):
+    """
+    Represents replacing an expense with an edited copy.
+    """
+
+    def __init__(self, month, category, index, previous, expense):
+        """
+        Initializes the EditExpenseCommand class.
+
+        Args:
+            month (str): The month of the expense
+            category (str): The category of the expense
+            index (int): The index of the expense
+            previous (dict): The expense before the edit
+            expense (dict): The expense after the edit
+        """
+        super().__init__(month, category)
+        self.index = index
+        self.previous = previous
+        self.expense = expense
+
+    def apply(self, logic):
+        logic.replace_expense(self.month, self.category,
+                              self.index, self.expense)
+
+    def revert(self, logic):
+        logic.replace_expense(self.month, self.category,
+                              self.index, self.previous)
+
+
+class DeleteExpenseCommand(Command):
+    """
+    Represents deleting an expense from a category.
+    """
+
+    def __init__(self, month, category, index, expense):
+        """
+        Initializes the DeleteExpenseCommand class.
+
+        Args:
+            month (str): The month of the expense
+            category (str): The category of the expense
+            index (int): The index of the expense
+            expense (dict): The deleted expense
+        """
+        super().__init__(month, category)
+        self.index = index
+        self.expense = expense
+
+    def apply(self, logic):
+        logic.remove_expense(self.month, self.category, self.index)
+
+    def revert(self, logic):
+        logic.insert_expense(self.month, self.category,
+                             self.expense, self.index)
+
+
+class BudgetCommand(Command):
+    """
+    Represents changing the budget of a month.
+    """
+
+    def __init__(self, month, previous, budget):
+        """
+        Initializes the BudgetCommand class.
+
+        Args:
+            month (str): The month of the budget
+            previous (float): The budget before the change
+            budget (float): The budget after the change
+        """
+        super().__init__(month, None)
+        self.previous = previous
+        self.budget = budget
+
+    def apply(self, logic):
+        logic.change_budget(self.month, self.budget)
+
+    def revert(self, logic):
+        logic.change_budget(self.month, self.previous)
+
+
+class CategoryBudgetCommand(Command):
+    """
+    Represents changing the budget of a category in a month.
+    """
+
+    def __init__(self, month, category, previous, budget):
+        """
+        Initializes the CategoryBudgetCommand class.
+
+        Args:
+            month (str): The month of the budget
+            category (str): The category of the budget
+            previous (float): The budget before the change, None if the
+                category had no budget
+            budget (float): The budget after the change, None to remove it
+        """
+        super().__init__(month, category)
+        self.previous = previous
+        self.budget = budget
+
+    def apply(self, logic):
+        logic.change_category_budget(self.month, self.category, self.budget)
+
+    def revert(self, logic):
+        logic.change_category_budget(self.month, self.category, self.previous)
+
+
+class CommandHistory:
+    """
+    Represents the bounded undo/redo history of the expense changes.
+
+    Besides the command stacks, the history can take named checkpoints of the
+    whole ledger. Checkpoints are structurally shared: a new checkpoint only
+    copies the categories changed since the previous one and reuses the
+    frozen item tuples of all the others.
+    """
+
+    def __init__(self, limit=100, checkpoint_limit=10):
+        """
+        Initializes the CommandHistory class.
+
+        Args:
+            limit (int): The maximum number of commands that can be undone
+                (default: 100)
+            checkpoint_limit (int): The maximum number of checkpoints kept
+                (default: 10)
+        """
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = deque(maxlen=limit)
+        self.checkpoints = {}
+        self.checkpoint_limit = checkpoint_limit
+        self.last_snapshot = None
+        self.dirty = set()
+
+    def record(self, command):
+        """Records an applied command and clears the redo stack
+
+        Args:
+            command (Command): The applied command
+        """
+        self.undo_stack.append(command)
+        self.redo_stack.clear()
+
+    def touch(self, month, category):
+        """Marks a category as changed since the last checkpoint
+
+        Must be called for every change of the items of a category, recorded
+        or not, so the next checkpoint copies the category instead of
+        sharing it with the previous checkpoint.
+
+        Args:
+            month (str): The month of the category
+            category (str): The changed category
+        """
+        self.dirty.add((month, category))
+
+    def can_undo(self):
+        """Checks if there is a change to undo
+
+        Returns:
+            bool: True if the undo stack is not empty
+        """
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        """Checks if there is a change to redo
+
+        Returns:
+            bool: True if the redo stack is not empty
+        """
+        return bool(self.redo_stack)
+
+    def clear(self):
+        """Forgets all commands
+
+        Must be called when the ledger was changed outside of the recorded
+        commands in a way that invalidates their positions.
+        """
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+    def undo(self, logic):
+        """Reverts the last recorded command
+
+        Args:
+            logic (FinancialLogic): The logic to revert the command on
+
+        Returns:
+            bool: True if a command was reverted
+        """
+        if not self.undo_stack:
+            return False
+        command = self.undo_stack.pop()
+        command.revert(logic)
+        self.redo_stack.append(command)
+        return True
+
+    def redo(self, logic):
+        """Applies the last reverted command again
+
+        Args:
+            logic (FinancialLogic): The logic to apply the command to
+
+        Returns:
+            bool: True if a command was applied
+        """
+        if not self.redo_stack:
+            return False
+        command = self.redo_stack.pop()
+        command.apply(logic)
+        self.undo_stack.append(command)
+        return True
+
+    def checkpoint(self, name, data):
+        """Takes a named snapshot of the whole ledger
+
+        Args:
+            name (str): The name of the checkpoint
+            data (dict): The expense data of all months
+        """
+        previous = self.last_snapshot
+        snapshot = {}
+        for month, details in data.items():
+            old_month = previous.get(month) if previous else None
+            categories = {}
+            for category, expenses in details['money'].items():
+                if old_month and (month, category) not in self.dirty \
+                        and category in old_month['money']:
+                    categories[category] = old_month['money'][category]
+                else:
+                    categories[category] = (
+                        tuple(expenses['items']), expenses['sumOfAmounts'])
+            snapshot[month] = dict(details, money=categories)
+
+        if name not in self.checkpoints and len(self.checkpoints) >= self.checkpoint_limit:
+            del self.checkpoints[next(iter(self.checkpoints))]
+        self.checkpoints[name] = snapshot
+        self.last_snapshot = snapshot
+        self.dirty = set()
+
+    def restore(self, name):
+        """Builds the expense data of a named checkpoint
+
+        The undo and redo stacks are cleared because their commands refer to
+        the state before the restore.
+
+        Args:
+            name (str): The name of the checkpoint
+
+        Returns:
+            dict: the expense data of all months at the checkpoint
+        """
+        snapshot = self.checkpoints[name]
+        data = {}
+        for month, details in snapshot.items():
+            money = {category: {'items': list(items), 'sumOfAmounts': total}
+                     for category, (items, total) in details['money'].items()}
+            data[month] = dict(details, money=money)
+        self.clear()
+        self.last_snapshot = snapshot
+        self.dirty = set()
+        return data
+
+    def forget_snapshot(self):
+        """Stops sharing with the last checkpoint
+
+        Must be called when the ledger was replaced outside of the recorded
+        commands, e.g. reloaded from a file changed by someone else.
+        """
+        self.last_snapshot = None
+        self.dirty = set()
@@ -1,3 +1,20 @@
+import os
+
+
+def expenses_file_path():
+    """Get the path of the JSON file of expenses
+
+    The path can be overridden with the EXPENSES_FILE environment variable,
+    e.g. to run the app on a copy of the ledger.
+
+    Returns:
+        str: the path of 'expenses.json' next to this file, or the value of
+        EXPENSES_FILE
+    """
+    return os.environ.get('EXPENSES_FILE') or os.path.join(os.path.dirname(
+        os.path.abspath(__file__)), 'expenses.json')
+
+
 category_type = {
     1: "Food",
     2: "Transport",
@@ -12,66 +29,82 @@ category_type = {
     11: "Entertainment"
 }
 
+sync_server_url = "http://127.0.0.1:8765"
+
+base_currency = "RUB"
+
 
 data = {
     "January": {
         "money": {},
         "totalSum": 0.0,
-        "budget": 0.0
+        "budget": 0.0,
+        "categoryBudgets": {}
     },
     "February": {
         "money": {},
         "totalSum": 0.0,
-        "budget": 0.0
+        "budget": 0.0,
+        "categoryBudgets": {}
     },
     "March": {
         "money": {},
         "totalSum": 0.0,
-        "budget": 0.0
+        "budget": 0.0,
+        "categoryBudgets": {}
     },
     "April": {
         "money": {},
         "totalSum": 0.0,
-        "budget": 0.0
+        "budget": 0.0,
+        "categoryBudgets": {}
     },
     "May": {
         "money": {},
         "totalSum": 0.0,
-        "budget": 0.0
+        "budget": 0.0,
+        "categoryBudgets": {}
     },
     "June": {
         "money": {},
         "totalSum": 0.0,
-        "budget": 0.0
+        "budget": 0.0,
+        "categoryBudgets": {}
     },
     "July": {
         "money": {},
         "totalSum": 0.0,
-        "budget": 0.0
+        "budget": 0.0,
+        "categoryBudgets": {}
     },
     "August": {
         "money": {},
         "totalSum": 0.0,
-        "budget": 0.0
+        "budget": 0.0,
+        "categoryBudgets": {}
     },
     "September": {
         "money": {},
         "totalSum": 0.0,
-        "budget": 0.0
+        "budget": 0.0,
+        "categoryBudgets": {}
     },
     "October": {
         "money": {},
         "totalSum": 0.0,
-        "budget": 0.0
+        "budget": 0.0,
+        "categoryBudgets": {}
     },
     "November": {
         "money": {},
         "totalSum": 0.0,
-        "budget": 0.0
+        "budget": 0.0,
+        "categoryBudgets": {}
     },
     "December": {
         "money": {},
         "totalSum": 0.0,
-        "budget": 0.0
+        "budget": 0.0,
+        "categoryBudgets": {}
     }
 }
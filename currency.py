@@ -0,0 +1,182 @@
+import os
+import json
+import hashlib
+from bisect import bisect_right
+from constants import base_currency, expenses_file_path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def rates_path(file_path):
+    """Get the path of the rate file kept next to a JSON file of expenses
+
+    Args:
+        file_path (str): The path of the JSON file of expenses
+
+    Returns:
+        str: the path of the rate file
+    """
+    root, _ = os.path.splitext(file_path)
+    return root + '.rates.json'
+
+
+class RateTable:
+    """
+    Represents the historical exchange rates to the base currency.
+
+    The rates are read from a local JSON file of the form
+    {"base": "EUR", "rates": {"USD": {"2024-01-02": 0.91, ...}}}, where a
+    rate is the amount of the base currency paid for one unit of the
+    currency. An expense uses the rate of its date or, when there is none
+    for that day, of the nearest previous date. Looked up rates are cached
+    per (date, currency) and the cache is dropped when the file changes.
+    """
+
+    def __init__(self, file_path=None):
+        """
+        Initializes the RateTable class.
+
+        Args:
+            file_path (str): The path of the JSON file of expenses
+                (default: expenses_file_path())
+        """
+        self.path = rates_path(file_path or expenses_file_path())
+        self.base = base_currency
+        self.stamp = None
+        self.checksum = None
+        self.loaded = False
+        self.dates = {}
+        self.values = {}
+        self.cache = {}
+        self.load()
+
+    def load(self):
+        """Reads the rate file again if it changed since the last load
+
+        Returns:
+            bool: True if the rates changed
+        """
+        if os.path.exists(self.path):
+            stat = os.stat(self.path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        else:
+            stamp = None
+        if self.loaded and stamp == self.stamp:
+            return False
+
+        rates, base, checksum = {}, base_currency, ''
+        if stamp is not None:
+            with open(self.path, 'rb') as file:
+                content = file.read()
+            checksum = hashlib.sha256(content).hexdigest()
+            rate_file = json.loads(content.decode())
+            base = rate_file.get('base', base_currency)
+            rates = rate_file.get('rates', {})
+
+        changed = self.loaded and checksum != self.checksum
+        self.loaded = True
+        self.stamp = stamp
+        self.checksum = checksum
+        self.base = base
+        self.dates = {}
+        self.values = {}
+        for currency, by_date in rates.items():
+            dates = sorted(by_date)
+            self.dates[currency] = dates
+            self.values[currency] = [float(by_date[date]) for date in dates]
+        self.cache = {}
+        return changed
+
+    def currencies(self):
+        """Get the currencies that can be converted
+
+        Returns:
+            list: the base currency followed by the currencies with rates
+        """
+        return [self.base] + sorted(currency for currency in self.dates
+                                    if currency != self.base)
+
+    def rate(self, currency, date):
+        """Get the rate of a currency at a date
+
+        Args:
+            currency (str): The currency code
+            date (str): The date as YYYY-MM-DD, None for the latest rate
+
+        Returns:
+            float: the amount of the base currency for one unit
+
+        Raises:
+            ValueError: if there is no rate for the currency
+        """
+        if currency == self.base:
+            return 1.0
+        key = (date, currency)
+        rate = self.cache.get(key)
+        if rate is None:
+            dates = self.dates.get(currency)
+            if not dates:
+                raise ValueError(f"No exchange rate for {currency}")
+            # Dates before the first known rate use the first one
+            position = max(bisect_right(dates, date or '\uffff') - 1, 0)
+            rate = self.cache[key] = self.values[currency][position]
+        return rate
+
+    def convert(self, amount, currency, date):
+        """Converts an amount to the base currency
+
+        Args:
+            amount (float): The amount in its own currency
+            currency (str): The currency code
+            date (str): The date of the expense
+
+        Returns:
+            float: the amount in the base currency, rounded to cents
+        """
+        return round(amount * self.rate(currency, date), 2)
+
+    def convert_many(self, amounts, currencies, dates):
+        """Converts many amounts to the base currency at once
+
+        The amounts are grouped by currency and the rates of a group are
+        looked up together, with numpy when it is installed. The results are
+        the same as those of convert().
+
+        Args:
+            amounts (list): The amounts in their own currencies
+            currencies (list): The currency code of every amount
+            dates (list): The date of every amount
+
+        Returns:
+            list: the amounts in the base currency, rounded to cents
+
+        Raises:
+            ValueError: if there is no rate for one of the currencies
+        """
+        groups = {}
+        for position, currency in enumerate(currencies):
+            groups.setdefault(currency, []).append(position)
+
+        converted = [0.0] * len(amounts)
+        for currency, positions in groups.items():
+            values = [amounts[position] for position in positions]
+            if currency == self.base:
+                products = values
+            elif np is not None:
+                if not self.dates.get(currency):
+                    raise ValueError(f"No exchange rate for {currency}")
+                found = np.searchsorted(
+                    np.array(self.dates[currency]),
+                    np.array([dates[position] or '\uffff' for position in positions]),
+                    side='right') - 1
+                rates = np.array(self.values[currency])[np.maximum(found, 0)]
+                products = (np.array(values, dtype=float) * rates).tolist()
+            else:
+                products = [value * self.rate(currency, dates[position])
+                            for value, position in zip(values, positions)]
+            for position, product in zip(positions, products):
+                converted[position] = round(product, 2)
+        return converted
@@ -0,0 +1,307 @@
+import os
+import math
+import struct
+import hashlib
+from collections import defaultdict
+from datetime import date
+from difflib import SequenceMatcher
+from ledger_stream import iter_expenses
+from constants import expenses_file_path
+
+
+HEADER = struct.Struct('<QQQQqq')
+
+
+def fingerprint(expense, category):
+    """Calculates the fingerprint of an expense
+
+    The amount is rounded to cents and the description is lowercased with
+    single spaces, so trivially different entries of the same expense get
+    the same fingerprint.
+
+    Args:
+        expense (dict): The expense
+        category (str): The category of the expense
+
+    Returns:
+        bytes: the 16 byte fingerprint
+    """
+    key = '\x1f'.join((
+        str(round(expense['amount'] * 100)),
+        expense.get('date', ''),
+        ' '.join(expense.get('description', '').lower().split()),
+        category
+    ))
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+
+class BloomFilter:
+    """
+    Represents a Bloom filter of expense fingerprints.
+
+    The bit positions are derived from the two halves of the fingerprint by
+    double hashing, so no further hashing is needed per lookup.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        """
+        Initializes the BloomFilter class.
+
+        Args:
+            capacity (int): The number of fingerprints the filter is sized
+                for (default: 100000)
+            error_rate (float): The false positive rate at full capacity
+                (default: 0.001)
+        """
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, digest):
+        """Get the bit positions of a fingerprint
+
+        Args:
+            digest (bytes): The fingerprint
+
+        Returns:
+            generator: the bit positions
+        """
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, digest):
+        """Adds a fingerprint to the filter
+
+        Args:
+            digest (bytes): The fingerprint
+        """
+        for position in self.positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self.positions(digest))
+
+    def save(self, path, stamp):
+        """Saves the filter to a file
+
+        Args:
+            path (str): The path of the file
+            stamp (tuple): The size and modification time of the ledger the
+                filter was built from
+        """
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(self.capacity, self.size,
+                       self.hashes, self.count, *stamp))
+            file.write(self.bits)
+
+    @classmethod
+    def load(cls, path):
+        """Loads a filter from a file
+
+        Args:
+            path (str): The path of the file
+
+        Returns:
+            tuple: the filter and the stamp of the ledger it was built from
+        """
+        with open(path, 'rb') as file:
+            capacity, size, hashes, count, ledger_size, mtime_ns = HEADER.unpack(
+                file.read(HEADER.size))
+            bloom = cls.__new__(cls)
+            bloom.capacity = capacity
+            bloom.size = size
+            bloom.hashes = hashes
+            bloom.count = count
+            bloom.bits = bytearray(file.read())
+            if len(bloom.bits) != (size + 7) // 8:
+                raise ValueError("Truncated Bloom filter file")
+        return bloom, (ledger_size, mtime_ns)
+
+
+class DuplicateDetector:
+    """
+    Represents the detection of duplicate expenses.
+
+    New expenses are first checked against a Bloom filter persisted next to
+    the ledger. Only when the filter reports a possible match, the exact set
+    of fingerprints is built from the ledger and consulted, so the common
+    case of a new expense costs a few bit lookups. Changes update the filter
+    in memory and flush() saves it once, after the ledger was written.
+    """
+
+    def __init__(self, file_path=None, error_rate=0.001):
+        """
+        Initializes the DuplicateDetector class.
+
+        Args:
+            file_path (str): The path of the JSON file of expenses
+                (default: expenses_file_path())
+            error_rate (float): The false positive rate of the Bloom filter
+                (default: 0.001)
+        """
+        self.file_path = file_path or expenses_file_path()
+        self.bloom_path = os.path.splitext(self.file_path)[0] + '.bloom'
+        self.error_rate = error_rate
+        self.exact = None
+        self.bloom = None
+        self.unsaved = False
+        try:
+            bloom, stamp = BloomFilter.load(self.bloom_path)
+            if stamp == self.ledger_stamp():
+                self.bloom = bloom
+        except (OSError, ValueError, struct.error):
+            pass
+        if self.bloom is None:
+            self.rebuild()
+
+    def ledger_stamp(self):
+        """Get the size and modification time of the ledger
+
+        Returns:
+            tuple: the size and the modification time in nanoseconds
+        """
+        stat = os.stat(self.file_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def rebuild(self, capacity=None):
+        """Rebuilds the Bloom filter with one streaming pass over the ledger
+
+        Args:
+            capacity (int): The capacity of the new filter (default: twice
+                the number of expenses, at least 100000)
+        """
+        digests = [fingerprint(expense, category)
+                   for _, category, expense in iter_expenses(self.file_path)]
+        self.bloom = BloomFilter(
+            capacity or max(100000, 2 * len(digests)), self.error_rate)
+        for digest in digests:
+            self.bloom.add(digest)
+        self.exact = None
+        self.save()
+
+    def save(self):
+        """Saves the Bloom filter next to the ledger
+
+        The filter is stamped with the ledger as it is on disk, so it must
+        only be saved once the changes it holds were written to the ledger.
+        """
+        self.bloom.save(self.bloom_path, self.ledger_stamp())
+        self.unsaved = False
+
+    def flush(self):
+        """Saves the Bloom filter if it changed since it was saved
+
+        A filter filled beyond its capacity is rebuilt with twice the room.
+        """
+        if not self.unsaved:
+            return
+        if self.bloom.count > self.bloom.capacity:
+            self.rebuild(2 * self.bloom.count)
+        else:
+            self.save()
+
+    def load_exact(self):
+        """Builds the exact multiset of fingerprints from the ledger
+
+        Returns:
+            dict: the number of expenses per fingerprint
+        """
+        if self.exact is None:
+            self.exact = defaultdict(int)
+            for _, category, expense in iter_expenses(self.file_path):
+                self.exact[fingerprint(expense, category)] += 1
+        return self.exact
+
+    def is_duplicate(self, expense, category):
+        """Checks if an expense is already in the ledger
+
+        Args:
+            expense (dict): The expense
+            category (str): The category of the expense
+
+        Returns:
+            bool: True if an expense with the same fingerprint exists
+        """
+        digest = fingerprint(expense, category)
+        if digest not in self.bloom:
+            return False
+        return self.load_exact().get(digest, 0) > 0
+
+    def observe(self, change):
+        """Updates the filter with a change reported by FinancialLogic
+
+        Listeners can run before the change is written, e.g. during a batch,
+        so the filter is only updated in memory until flush() is called.
+
+        Args:
+            change (dict): The change as reported by FinancialLogic listeners
+        """
+        action = change['action']
+        if action in ('add', 'edit'):
+            digest = fingerprint(change['expense'], change['category'])
+            self.bloom.add(digest)
+            if self.exact is not None:
+                self.exact[digest] += 1
+        if action in ('delete', 'edit') and self.exact is not None:
+            source = change['previous'] if action == 'edit' else change['expense']
+            digest = fingerprint(source, change['category'])
+            self.exact[digest] -= 1
+            if self.exact[digest] <= 0:
+                del self.exact[digest]
+        self.unsaved = True
+
+    def near_duplicates(self, days=3, similarity=0.8):
+        """Finds pairs of expenses that are probably the same
+
+        Expenses are bucketed by category and amount in cents. Every bucket
+        is sorted by date once and an expense is only compared with the
+        following ones within the window of days. The similarity of a pair of
+        descriptions is computed once per bucket. Expenses without a date are
+        only compared with other undated expenses.
+
+        Args:
+            days (int): The maximum number of days between the expenses
+                (default: 3)
+            similarity (float): The minimum similarity of the descriptions
+                from 0 to 1 (default: 0.8)
+
+        Returns:
+            list: the (month, category, first expense, second expense)
+            tuples of the suspected duplicates
+        """
+        buckets = defaultdict(list)
+        for month, category, expense in iter_expenses(self.file_path):
+            buckets[category, round(expense['amount'] * 100)].append(
+                (month, expense))
+
+        suspects = []
+        for (category, _), entries in buckets.items():
+            dated, undated = [], []
+            for month, expense in entries:
+                entry = (month, expense, expense.get('description', '').lower())
+                if expense.get('date'):
+                    dated.append((date.fromisoformat(expense['date']).toordinal(),) + entry)
+                else:
+                    undated.append((0,) + entry)
+            dated.sort(key=lambda entry: entry[0])
+
+            ratios = {}
+            for group, window in ((dated, days), (undated, 0)):
+                for i, (day, month, first, text) in enumerate(group):
+                    for j in range(i + 1, len(group)):
+                        other_day, _, second, other_text = group[j]
+                        if other_day - day > window:
+                            break
+                        key = (text, other_text)
+                        ratio = ratios.get(key)
+                        if ratio is None:
+                            ratio = ratios[key] = SequenceMatcher(
+                                None, text, other_text).ratio()
+                        if ratio >= similarity:
+                            suspects.append((month, category, first, second))
+        return suspects
@@ -1,8 +1,9 @@
-import os
-import json
 from datetime import datetime
-from constants import category_type
+from constants import category_type, sync_server_url
 from PyQt5.QtGui import QColor, QPalette
+from categoriser import Categoriser, rules_file_path
+from dedup import DuplicateDetector
+from sync import SyncClient
 from financial_logic import FinancialLogic
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QLineEdit, QPushButton, QWidget, QComboBox, QTextEdit, QInputDialog, QMessageBox
 
@@ -65,13 +66,23 @@ class ExpenseTracker(QWidget):
     expenses and expenses by category.
     """
 
-    def __init__(self):
+    def __init__(self, logic=None):
         """
         Initializes the ExpenseTracker widget.
+
+        Args:
+            logic (FinancialLogic): The logic holding the expenses
+                (default: a new FinancialLogic)
         """
         super().__init__()
-        self.logic = FinancialLogic()
+        self.logic = logic or FinancialLogic()
+        self.categoriser = Categoriser(rules_file_path(self.logic.file_path))
+        self.duplicates = DuplicateDetector(self.logic.file_path)
+        self.logic.add_listener(self.duplicates.observe)
+        self.sync_client = SyncClient(self.logic, sync_server_url)
+        self.suggested_category = None
         self.expense_amount_input = None
+        self.expense_currency_input = None
         self.expense_category_input = None
         self.expense_description_input = None
 
@@ -96,6 +107,11 @@ class ExpenseTracker(QWidget):
             "Enter the expense amount")
         layout.addWidget(self.expense_amount_input)
 
+        self.expense_currency_input = QComboBox()
+        for currency in self.logic.rates.currencies():
+            self.expense_currency_input.addItem(currency)
+        layout.addWidget(self.expense_currency_input)
+
         self.expense_category_input = QComboBox()
         for category in category_type.values():
             self.expense_category_input.addItem(category)
@@ -104,6 +120,8 @@ class ExpenseTracker(QWidget):
         self.expense_description_input = QTextEdit()
         self.expense_description_input.setPlaceholderText(
             "Enter a description of the expense")
+        self.expense_description_input.textChanged.connect(
+            self.suggest_category)
         layout.addWidget(self.expense_description_input)
 
         add_expense_button = QPushButton("Add Expense")
@@ -138,6 +156,36 @@ class ExpenseTracker(QWidget):
             self.show_expenses_by_category)
         layout.addWidget(show_expenses_by_category_button)
 
+        show_duplicates_button = QPushButton("Show Possible Duplicates")
+        show_duplicates_button.setStyleSheet(
+            "background-color: #5DA56C; color: white; font-weight: bold; font-size: 14px;")
+        show_duplicates_button.clicked.connect(self.show_duplicates)
+        layout.addWidget(show_duplicates_button)
+
+        category_budget_button = QPushButton("Set Category Budget")
+        category_budget_button.setStyleSheet(
+            "background-color: #5DA56C; color: white; font-weight: bold; font-size: 14px;")
+        category_budget_button.clicked.connect(self.set_category_budget)
+        layout.addWidget(category_budget_button)
+
+        undo_button = QPushButton("Undo")
+        undo_button.setStyleSheet(
+            "background-color: #5DA56C; color: white; font-weight: bold; font-size: 14px;")
+        undo_button.clicked.connect(self.undo)
+        layout.addWidget(undo_button)
+
+        redo_button = QPushButton("Redo")
+        redo_button.setStyleSheet(
+            "background-color: #5DA56C; color: white; font-weight: bold; font-size: 14px;")
+        redo_button.clicked.connect(self.redo)
+        layout.addWidget(redo_button)
+
+        sync_button = QPushButton("Sync with Server")
+        sync_button.setStyleSheet(
+            "background-color: #5DA56C; color: white; font-weight: bold; font-size: 14px;")
+        sync_button.clicked.connect(self.sync)
+        layout.addWidget(sync_button)
+
         self.return_main_button = QPushButton("Back to Main Page")
         self.return_main_button.setStyleSheet(
             "background-color: #5DA56C; color: white; font-weight: bold; font-size: 14px;")
@@ -150,19 +198,15 @@ class ExpenseTracker(QWidget):
         self.setPalette(palette)
         self.show()
 
-        file_path = os.path.join(os.path.dirname(
-            os.path.abspath(__file__)), "expenses.json")
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, "r") as file:
-                    json_data = json.load(file)
-                    self.logic.expenses = json_data.get("money", {})
-            except FileNotFoundError:
-                pass
-
-        palette = self.palette()
-        palette.setColor(QPalette.Background, QColor(220, 240, 230))
-        self.setPalette(palette)
+    def suggest_category(self):
+        """
+        Selects the category suggested by the categorisation rules for the
+        entered description.
+        """
+        description = self.expense_description_input.toPlainText()
+        self.suggested_category = self.categoriser.categorise(description)
+        if self.suggested_category is not None:
+            self.expense_category_input.setCurrentText(self.suggested_category)
 
     def add_expense(self):
         """
@@ -170,12 +214,33 @@ class ExpenseTracker(QWidget):
 
         Retrieves the amount, category, and description from the input fields and
         calls the add_expense method of the FinancialLogic class to add the
-        expense.
+        expense. When the chosen category differs from the suggested one, a
+        categorisation rule is learned from the correction. An expense that
+        is already in the ledger is only added after confirmation.
         """
         amount = float(self.expense_amount_input.text())
+        currency = self.expense_currency_input.currentText()
         category = self.expense_category_input.currentIndex() + 1
         description = self.expense_description_input.toPlainText()
-        self.logic.add_expense(amount, category_type[category], description)
+        expense = {
+            'amount': amount,
+            'description': description,
+            'date': datetime.now().strftime("%Y-%m-%d")
+        }
+        if currency != self.logic.rates.base:
+            expense['amount'] = self.logic.rates.convert(
+                amount, currency, expense['date'])
+        if self.duplicates.is_duplicate(expense, category_type[category]):
+            answer = QMessageBox.question(
+                self, "Possible Duplicate",
+                "The same expense was already added today. Add it anyway?")
+            if answer != QMessageBox.Yes:
+                return
+        if self.suggested_category is not None and \
+                category_type[category] != self.suggested_category:
+            self.categoriser.learn(description, category_type[category])
+        self.logic.add_expense(
+            amount, category_type[category], description, currency)
         self.show_success_message("Expense added successfully.")
 
     def edit_expense(self):
@@ -249,6 +314,57 @@ class ExpenseTracker(QWidget):
                 self.logic.delete_expense(category_type[category], index)
                 self.show_success_message("Expense deleted successfully.")
 
+    def set_category_budget(self):
+        """
+        Sets the monthly budget of the selected category.
+
+        Asks the user for the budget and calls the set_category_budget method
+        of the FinancialLogic class. A budget of 0 removes the budget of the
+        category.
+        """
+        category = category_type[self.expense_category_input.currentIndex() + 1]
+        budgets = self.logic.load_data()[self.current_month].get(
+            'categoryBudgets', {})
+        budget, ok = QInputDialog.getDouble(
+            self, "Set Category Budget", f"Budget for {category}:",
+            budgets.get(category, 0.0), 0, 1e9, 2)
+        if ok:
+            self.logic.set_category_budget(category, budget or None)
+            self.show_success_message("Category budget set successfully.")
+
+    def undo(self):
+        """
+        Undoes the last change of the expenses or the budget.
+        """
+        if self.logic.undo():
+            self.show_success_message("Last change undone.")
+        else:
+            self.show_info_message("There is nothing to undo.")
+
+    def redo(self):
+        """
+        Redoes the last undone change of the expenses or the budget.
+        """
+        if self.logic.redo():
+            self.show_success_message("Last undone change redone.")
+        else:
+            self.show_info_message("There is nothing to redo.")
+
+    def sync(self):
+        """
+        Synchronises the expenses with the sync server.
+
+        Calls the sync method of the SyncClient class and displays the number
+        of received and sent changes.
+        """
+        try:
+            pulled, pushed = self.sync_client.sync()
+        except OSError as error:
+            self.show_info_message(f"Sync failed: {error}")
+            return
+        self.show_success_message(
+            f"Synced: {pulled} changes received, {pushed} changes sent.")
+
     def show_total_expenses(self):
         """
         Shows the total expenses.
@@ -277,9 +393,28 @@ class ExpenseTracker(QWidget):
         else:
             message = f"Expenses in the category {category_type[category_num]}:\n"
             for index, expense in enumerate(expenses_by_category):
-                message += f"Index: {index}, Amount: {expense['amount']}, Description: {expense['description']}\n"
+                amount = expense['amount']
+                if 'currency' in expense:
+                    amount = f"{amount} ({expense['originalAmount']} {expense['currency']})"
+                message += f"Index: {index}, Amount: {amount}, Description: {expense['description']}\n"
             self.show_info_message(message)
 
+    def show_duplicates(self):
+        """
+        Shows the pairs of expenses that are probably duplicates.
+
+        Calls the near_duplicates method of the DuplicateDetector class and
+        displays the suspected pairs in an information message box.
+        """
+        suspects = self.duplicates.near_duplicates()
+        if not suspects:
+            self.show_info_message("No possible duplicates found.")
+            return
+        message = "Possible duplicates:\n"
+        for month, category, first, second in suspects:
+            message += f"{month}, {category}: {first['amount']} \"{first['description']}\" and \"{second['description']}\"\n"
+        self.show_info_message(message)
+
     def show_success_message(self, message):
         """
         Displays a success message box.
@@ -0,0 +1,408 @@
+import calendar
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+MONTHS = list(calendar.month_name)[1:]
+DAYS = 31
+
+
+class CategoryModel:
+    """
+    Represents the fitted spending model of a single category.
+
+    The model keeps sufficient statistics of the past months (number of
+    months, total spent and the spending of every day of the month) so it can
+    absorb a new month without being refitted from scratch.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty CategoryModel.
+        """
+        self.months = 0
+        self.total = 0.0
+        self.day_totals = [0.0] * DAYS
+        self.profile = None
+
+    def absorb(self, day_totals, months=1):
+        """Adds the daily spending of past months to the model
+
+        Args:
+            day_totals (list): The amount spent on every day of the month
+            months (int): The number of months the amounts cover (default: 1)
+        """
+        self.months += months
+        for day, amount in enumerate(day_totals):
+            self.day_totals[day] += amount
+            self.total += amount
+        self.profile = None
+
+    def shift(self, day, amount):
+        """Adds an amount spent on a day of a past month to the model
+
+        Args:
+            day (int): The zero-based day, None to spread the amount evenly
+                over the month
+            amount (float): The amount, negative to take it away
+        """
+        if day is None:
+            for position in range(DAYS):
+                self.day_totals[position] += amount / DAYS
+        else:
+            self.day_totals[day] += amount
+        self.total += amount
+        self.profile = None
+
+    def monthly_mean(self):
+        """Calculates the mean monthly spending of the category
+
+        Returns:
+            float: the mean amount spent per month, 0.0 without history
+        """
+        if self.months == 0:
+            return 0.0
+        return self.total / self.months
+
+    def expected_share(self, day):
+        """Calculates the share of the monthly spending expected by a day
+
+        Args:
+            day (int): The day of the month
+
+        Returns:
+            float: the expected share in the range [0, 1], or None when the
+            category has no history
+        """
+        if self.total <= 0:
+            return None
+        if self.profile is None:
+            self.profile = _cumulative_share(self.day_totals, self.total)
+        return self.profile[min(day, DAYS) - 1]
+
+
+class SpendingForecaster:
+    """
+    Represents the forecasting of the month-end spending per category.
+
+    The forecaster fits a CategoryModel for every category from the months
+    preceding the current one, projects the month-end spending from the
+    amount spent so far and suggests reductions that bring the projected
+    total back within the budget. Fitted models are cached and updated
+    incrementally through observe() and roll_over().
+    """
+
+    def __init__(self, current_month=None, today=None):
+        """
+        Initializes the SpendingForecaster class.
+
+        Args:
+            current_month (str): The month to forecast (default: the current
+                month)
+            today (datetime): The date of the forecast (default: now)
+        """
+        self.today = today or datetime.now()
+        self.current_month = current_month or self.today.strftime("%B")
+        self.models = {}
+        self.history = None
+        self.spent = {}
+        self.budget = 0.0
+
+    def fit(self, data, expenses=None):
+        """Fits the models of all categories from the expense data
+
+        Args:
+            data (dict): The expense data loaded from the JSON file or its
+                summary without the items
+            expenses (iterable): The (month, category, expense) tuples of
+                all expenses (default: the items of data)
+        """
+        history = self.history_months(data)
+        categories = set()
+        for month in history + [self.current_month]:
+            categories.update(data[month]['money'].keys())
+        categories = sorted(categories)
+
+        if expenses is None:
+            expenses = _iter_items(data)
+        day_totals = _day_totals(expenses, history, categories)
+        self.history = {month: data[month]['totalSum'] for month in history}
+        self.models = {}
+        for category, totals in zip(categories, day_totals):
+            model = CategoryModel()
+            model.absorb(totals, months=len(history))
+            self.models[category] = model
+
+        self.spent = {category: details['sumOfAmounts']
+                      for category, details in data[self.current_month]['money'].items()}
+        self.budget = data[self.current_month]['budget']
+
+    def history_months(self, data):
+        """Get the months preceding the current month that contain expenses
+
+        Args:
+            data (dict): The expense data loaded from the JSON file
+
+        Returns:
+            list: the names of the months used as history
+        """
+        index = MONTHS.index(self.current_month)
+        return [month for month in MONTHS[:index]
+                if month in data and data[month]['totalSum'] > 0]
+
+    def model(self, category):
+        """Get the model of a category, creating it when there is none
+
+        Args:
+            category (str): The category
+
+        Returns:
+            CategoryModel: the model, which covers all months of the history
+        """
+        model = self.models.get(category)
+        if model is None:
+            model = self.models[category] = CategoryModel()
+            model.months = len(self.history or ())
+        return model
+
+    def observe(self, change):
+        """Updates the forecast with a change of the expenses
+
+        A change of the current month updates its running totals, a change of
+        a past month is applied to the fitted model of its category.
+
+        Args:
+            change (dict): The change as reported by FinancialLogic listeners
+        """
+        if change['action'] == 'budget':
+            if change['month'] == self.current_month:
+                self.budget = change['expense']['budget']
+            return
+        if change['action'] not in ('add', 'edit', 'delete'):
+            return
+        if change['month'] != self.current_month:
+            self.observe_history(change)
+            return
+        amount = change['expense']['amount']
+        if change['action'] == 'delete':
+            amount = -amount
+        elif change['action'] == 'edit':
+            amount -= change['previous']['amount']
+        category = change['category']
+        self.spent[category] = self.spent.get(category, 0.0) + amount
+        self.model(category)
+
+    def observe_history(self, change):
+        """Applies a change of a past month to the fitted models
+
+        A month joins the history when it gets its first expense and leaves
+        it when its total drops to zero, like in fit(). Changes are ignored
+        until the models are fitted and for months after the current one.
+
+        Args:
+            change (dict): The change of an expense of another month
+        """
+        month = change['month']
+        if self.history is None or month not in MONTHS[:MONTHS.index(self.current_month)]:
+            return
+        deltas = []
+        if change['action'] != 'add':
+            removed = change['previous'] if change['action'] == 'edit' else change['expense']
+            deltas.append((_day_of(removed), -removed['amount']))
+        if change['action'] != 'delete':
+            deltas.append((_day_of(change['expense']), change['expense']['amount']))
+
+        total = self.history.get(month, 0.0) + sum(amount for _, amount in deltas)
+        if (month in self.history) != (total > 0):
+            step = 1 if total > 0 else -1
+            for model in self.models.values():
+                model.months += step
+        if total > 0:
+            self.history[month] = total
+        else:
+            self.history.pop(month, None)
+
+        model = self.model(change['category'])
+        for day, amount in deltas:
+            model.shift(day, amount)
+
+    def roll_over(self, data, month, expenses=None):
+        """Moves the forecast to a new month
+
+        The finished month is absorbed into the cached models instead of
+        refitting all of them. Use fit() when more than one month passed.
+
+        Args:
+            data (dict): The expense data loaded from the JSON file or its
+                summary without the items
+            month (str): The new month to forecast
+            expenses (iterable): The (month, category, expense) tuples of
+                all expenses (default: the items of data)
+        """
+        finished = self.current_month
+        self.current_month = month
+        if data[finished]['totalSum'] > 0:
+            categories = sorted(set(data[finished]['money']) | set(self.models))
+            if expenses is None:
+                expenses = _iter_items(data)
+            day_totals = _day_totals(expenses, [finished], categories)
+            for category, totals in zip(categories, day_totals):
+                self.model(category).absorb(totals)
+            self.history[finished] = data[finished]['totalSum']
+        self.spent = {category: details['sumOfAmounts']
+                      for category, details in data[month]['money'].items()}
+        self.budget = data[month]['budget']
+
+    def days_in_month(self):
+        """Get the number of days in the forecast month
+
+        Returns:
+            int: the number of days of the current month
+        """
+        month_index = MONTHS.index(self.current_month) + 1
+        return calendar.monthrange(self.today.year, month_index)[1]
+
+    def project(self):
+        """Projects the month-end spending of every category
+
+        The projection blends the run rate implied by the historical daily
+        profile with the historical monthly mean, trusting the current month
+        more as it progresses. Categories without history are extrapolated
+        linearly.
+
+        Returns:
+            dict: the projected month-end amount per category
+        """
+        days = self.days_in_month()
+        day = min(self.today.day, days)
+        progress = day / days
+        projections = {}
+        for category in set(self.models) | set(self.spent):
+            spent = self.spent.get(category, 0.0)
+            model = self.models.get(category)
+            share = model.expected_share(day) if model else None
+            if share is None:
+                projected = spent / progress
+            else:
+                run_rate = spent / share if share > 0.05 else spent / progress
+                mean = max(model.monthly_mean(), spent)
+                projected = progress * run_rate + (1 - progress) * mean
+            projections[category] = max(projected, spent)
+        return projections
+
+    def suggest_reductions(self):
+        """Suggests how much to cut per category to fit into the budget
+
+        The projected excess over the budget is split between the categories
+        in proportion to their remaining projected spending.
+
+        Returns:
+            dict: the suggested reduction per category, empty when the
+            projected total fits into the budget
+        """
+        projections = self.project()
+        excess = sum(projections.values()) - self.budget
+        if self.budget <= 0 or excess <= 0:
+            return {}
+        remaining = {category: projected - self.spent.get(category, 0.0)
+                     for category, projected in projections.items()}
+        base = sum(remaining.values())
+        if base <= 0:
+            remaining = projections
+            base = sum(projections.values())
+        return {category: excess * amount / base
+                for category, amount in remaining.items() if amount > 0}
+
+
+def _day_of(expense):
+    """Get the day of the month an expense was made
+
+    Args:
+        expense (dict): The expense
+
+    Returns:
+        int: the zero-based day, or None for expenses without a date
+    """
+    date = expense.get('date')
+    if not date:
+        return None
+    return int(date[-2:]) - 1
+
+
+def _iter_items(data):
+    """Iterates over the expenses of the expense data
+
+    Args:
+        data (dict): The expense data loaded from the JSON file
+
+    Yields:
+        tuple: (month, category, expense) for every expense
+    """
+    for month, details in data.items():
+        for category, expenses in details['money'].items():
+            for expense in expenses['items']:
+                yield month, category, expense
+
+
+def _day_totals(expenses, months, categories):
+    """Sums the spending of every category per day of the month
+
+    Expenses without a date are spread evenly over the month.
+
+    Args:
+        expenses (iterable): The (month, category, expense) tuples to sum
+        months (list): The months to sum
+        categories (list): The categories to sum
+
+    Returns:
+        list: one list of DAYS daily amounts per category
+    """
+    months = set(months)
+    row_of = {category: row for row, category in enumerate(categories)}
+    rows, days, amounts, undated = [], [], [], [0.0] * len(categories)
+    for month, category, expense in expenses:
+        row = row_of.get(category)
+        if month not in months or row is None:
+            continue
+        day = _day_of(expense)
+        if day is None:
+            undated[row] += expense['amount']
+        else:
+            rows.append(row)
+            days.append(day)
+            amounts.append(expense['amount'])
+
+    if np is not None:
+        totals = np.zeros((len(categories), DAYS))
+        np.add.at(totals, (np.array(rows, dtype=int),
+                  np.array(days, dtype=int)), np.array(amounts, dtype=float))
+        totals += np.array(undated)[:, None] / DAYS
+        return totals.tolist()
+
+    totals = [[amount / DAYS] * DAYS for amount in undated]
+    for row, day, amount in zip(rows, days, amounts):
+        totals[row][day] += amount
+    return totals
+
+
+def _cumulative_share(day_totals, total):
+    """Calculates the cumulative share of spending reached by every day
+
+    Args:
+        day_totals (list): The amount spent on every day of the month
+        total (float): The sum of day_totals
+
+    Returns:
+        list: the cumulative share per day
+    """
+    if np is not None:
+        return (np.cumsum(day_totals) / total).tolist()
+    shares, running = [], 0.0
+    for amount in day_totals:
+        running += amount
+        shares.append(running / total)
+    return shares
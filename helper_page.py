@@ -1,13 +1,14 @@
-import os
-import json
 from datetime import datetime
+from financial_logic import FinancialLogic
+from forecast import MONTHS, SpendingForecaster
 from PyQt5.QtGui import QColor, QPalette
 from PyQt5.QtWidgets import QLabel, QVBoxLayout, QWidget, QPushButton, QMainWindow
 
 
 class HelperPage(QMainWindow):
-    def __init__(self):
+    def __init__(self, logic=None):
         super().__init__()
+        self.logic = logic or FinancialLogic()
 
         # Set the window title
         self.setWindowTitle("Spending Reduction Categories")
@@ -20,16 +21,9 @@ class HelperPage(QMainWindow):
         # Get the current month
         self.current_month = datetime.now().strftime("%B")
 
-        # Load the expense data from the JSON file
-        file_path = os.path.join(os.path.dirname(
-            os.path.abspath(__file__)), 'expenses.json')
-        with open(file_path) as file:
-            self.data = json.load(file)
-
-        # Get the budget, total sum, and money data for the current month
-        self.budget = self.data[self.current_month]['budget']
-        self.total_sum = self.data[self.current_month]['totalSum']
-        self.money = self.data[self.current_month]['money']
+        # The spending forecast is fitted when it is first shown
+        self.forecaster = SpendingForecaster(self.current_month)
+        self.fitted = False
 
         # Set up the user interface
         self.setup_ui()
@@ -47,28 +41,61 @@ class HelperPage(QMainWindow):
         central_widget = QWidget(self)
         self.setCentralWidget(central_widget)
 
-        # Find categories to reduce spending
-        categories_to_reduce = []
-        for category, details in self.money.items():
-            sum_of_amounts = details['sumOfAmounts']
-            if sum_of_amounts > 0 and sum_of_amounts > self.budget:
-                categories_to_reduce.append(category)
-
         # Add a label for the categories to reduce spending
-        label = QLabel(
+        self.title_label = QLabel(
             f'Categories to reduce spending in {self.current_month}:')
-        label.setStyleSheet(
+        self.title_label.setStyleSheet(
             "color: black; font-weight: bold; font-size: 16px;")
-        self.layout.addWidget(label)
+        self.layout.addWidget(self.title_label)
 
-        # Add labels for each category to reduce spending
-        for category in categories_to_reduce:
-            category_label = QLabel(category)
-            category_label.setStyleSheet("color: black;")
-            self.layout.addWidget(category_label)
+        # Add a label for the forecast of each category
+        self.forecast_label = QLabel()
+        self.forecast_label.setStyleSheet("color: black;")
+        self.layout.addWidget(self.forecast_label)
 
         central_widget.setLayout(self.layout)
 
+    def update_forecast(self):
+        """
+        Update the label with the projected spending and suggested reductions.
+
+        The forecaster is fitted on the first update from the expenses that
+        FinancialLogic already holds, so the file is not read again. When a
+        new month began, the finished month is rolled over into the models.
+        """
+        now = datetime.now()
+        month = now.strftime("%B")
+        self.forecaster.today = now
+        if not self.fitted or month != self.current_month:
+            data = self.logic.load_data()
+            if self.fitted and MONTHS.index(month) == MONTHS.index(self.current_month) + 1:
+                self.forecaster.roll_over(data, month)
+            else:
+                self.forecaster.current_month = month
+                self.forecaster.fit(data)
+            self.fitted = True
+            self.current_month = month
+            self.title_label.setText(
+                f'Categories to reduce spending in {self.current_month}:')
+        projections = self.forecaster.project()
+        reductions = self.forecaster.suggest_reductions()
+        projected_total = sum(projections.values())
+
+        lines = [f'Projected spending: {projected_total:.2f} of {self.forecaster.budget:.2f}']
+        for category, reduction in sorted(reductions.items(), key=lambda item: -item[1]):
+            lines.append(
+                f'{category}: projected {projections[category]:.2f}, reduce by {reduction:.2f}')
+        if not reductions:
+            lines.append('You are on track to stay within the budget.')
+        self.forecast_label.setText('\n'.join(lines))
+
+    def handle_threshold_crossed(self, month, category, threshold, spent, budget):
+        """
+        Refresh the advice when the spending reached a share of a budget.
+        """
+        if month == self.current_month and self.fitted:
+            self.update_forecast()
+
     def create_return_main_button(self):
         """
         Create a button for returning to the main page.
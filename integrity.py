@@ -0,0 +1,430 @@
+import os
+import sys
+import json
+import math
+import hashlib
+import argparse
+from constants import data as template, expenses_file_path
+from ledger_stream import iter_events, CHUNK_SIZE, EXPENSE_DEPTH
+from summary_cache import build_summary, summary_path, write_ledger, write_summary
+
+
+# The expected kind of every field, by its position in the ledger
+MONTH_FIELDS = {'money': 'map', 'totalSum': 'number', 'budget': 'number',
+                'categoryBudgets': 'map', 'ratesChecksum': 'string',
+                'checksum': 'string'}
+EXPENSE_FIELDS = {'id': 'string', 'amount': 'number', 'description': 'string',
+                  'date': 'string', 'currency': 'string',
+                  'originalAmount': 'number'}
+TOLERANCE = 0.005
+KINDS = {dict: 'map', list: 'array', bool: 'bool', int: 'number',
+         float: 'number', str: 'string', type(None): 'null'}
+CANONICAL = json.JSONEncoder(sort_keys=True, separators=(',', ':'))
+
+
+def month_checksum(details):
+    """Calculates the checksum of the expenses of a month
+
+    The checksum covers the category and the fields of every expense in
+    order, so it changes with any edit of the items but not with the
+    aggregates or the budgets.
+
+    Args:
+        details (dict): The data of the month
+
+    Returns:
+        str: the hexadecimal SHA-256 checksum
+    """
+    digest = hashlib.sha256()
+    for category, expenses in details['money'].items():
+        for expense in expenses['items']:
+            digest.update(_canonical(category, expense))
+    return digest.hexdigest()
+
+
+def _canonical(category, expense):
+    """Get the canonical bytes of an expense hashed by month_checksum()
+
+    Args:
+        category (str): The category of the expense
+        expense (dict): The expense
+
+    Returns:
+        bytes: the compact JSON of the category and the expense
+    """
+    return CANONICAL.encode([category, expense]).encode()
+
+
+def _kind(event, value):
+    """Get the kind of a JSON value from its parse event
+
+    Args:
+        event (str): The parse event starting the value
+        value: The value of a 'value' event, which may be a decoded map or
+            array
+
+    Returns:
+        str: one of 'map', 'array', 'number', 'string', 'bool' or 'null'
+    """
+    if event == 'start_map':
+        return 'map'
+    if event == 'start_array':
+        return 'array'
+    return KINDS[type(value)]
+
+
+def _expected(path):
+    """Get the expected kind of the value at a path of the ledger
+
+    Args:
+        path (tuple): The path of the value as produced by iter_events()
+
+    Returns:
+        str: the expected kind, None for a field that is not in the schema
+    """
+    depth = len(path)
+    if depth == 0 or depth == 1:
+        return 'map'
+    if depth == 2:
+        return MONTH_FIELDS.get(path[1])
+    if path[1] == 'categoryBudgets':
+        return 'number' if depth == 3 else None
+    if path[1] != 'money':
+        return None
+    if depth == 3:
+        return 'map'
+    if depth == 4:
+        return {'items': 'array', 'sumOfAmounts': 'number'}.get(path[3])
+    if path[3] != 'items':
+        return None
+    if depth == 5:
+        return 'map'
+    if depth == 6:
+        return EXPENSE_FIELDS.get(path[5])
+    return None
+
+
+class IntegrityChecker:
+    """
+    Represents the integrity check and repair of the JSON file of expenses.
+
+    The check validates the schema, recomputes the 'sumOfAmounts' and
+    'totalSum' aggregates from the items and verifies the per-month
+    checksums in a single streaming pass, so only one chunk of the file is
+    in memory. Expenses are decoded at once and their fields checked
+    together. A file whose summary file records that it passed the check,
+    or was written by FinancialLogic from a file that did, is trusted
+    without being read. Problems are
+    repairable when fixing them cannot lose data; the repair rewrites the
+    file atomically.
+    """
+
+    def __init__(self, file_path=None):
+        """
+        Initializes the IntegrityChecker class.
+
+        Args:
+            file_path (str): The path of the JSON file of expenses
+                (default: expenses_file_path())
+        """
+        self.file_path = file_path or expenses_file_path()
+        self.problems = []
+        self.summary = None
+
+    def report(self, month, category, message, repairable):
+        """Records a problem of the ledger
+
+        Args:
+            month (str): The month of the problem, None for the whole file
+            category (str): The category of the problem, None for a month
+            message (str): The description of the problem
+            repairable (bool): True if repair() can fix the problem
+        """
+        self.problems.append({'month': month, 'category': category,
+                              'message': message, 'repairable': repairable})
+
+    def is_trusted(self):
+        """Checks whether the file is unchanged since it was last verified
+
+        Returns:
+            bool: True if the size and modification time of the file match
+            its summary file and the summary is marked as verified
+        """
+        try:
+            with open(summary_path(self.file_path)) as file:
+                source = json.load(file)['source']
+        except (OSError, ValueError, KeyError):
+            return False
+        stat = os.stat(self.file_path)
+        return source.get('verified', False) and \
+            source.get('size') == stat.st_size and \
+            source.get('mtime_ns') == stat.st_mtime_ns
+
+    def check(self, force=False, chunk_size=CHUNK_SIZE):
+        """Checks the integrity of the file
+
+        Args:
+            force (bool): Check the file even if it is trusted
+                (default: False)
+            chunk_size (int): The number of characters read at once
+                (default: 64 KiB)
+
+        Returns:
+            list: the problems found, as dicts with the keys 'month',
+            'category', 'message' and 'repairable'
+        """
+        self.problems = []
+        self.summary = None
+        if not force and self.is_trusted():
+            return self.problems
+        try:
+            with open(self.file_path) as file:
+                self.scan(iter_events(file, chunk_size, EXPENSE_DEPTH))
+        except ValueError as error:
+            self.report(None, None, f"The file is not valid JSON: {error}", False)
+        return self.problems
+
+    def scan(self, events):
+        """Checks the parse events of the file in one pass
+
+        The summary of the file is built on the way, with the sums computed
+        from the items.
+
+        Args:
+            events (iterable): The events as produced by iter_events(), with
+                the expenses either decoded or as separate events
+        """
+        self.summary = summary = {}
+        present, stored, digests, broken = set(), {}, {}, set()
+        expense, damaged, skipped = None, False, None
+
+        for path, event, value in events:
+            depth = len(path)
+            if skipped is not None:
+                # The content of an invalid value is not checked
+                if path == skipped and event in ('end_map', 'end_array'):
+                    skipped = None
+                continue
+            if event in ('start_map', 'start_array', 'value'):
+                if depth in (2, 4):
+                    present.add(path)
+                expected = _expected(path)
+                kind = _kind(event, value)
+                if expected is None:
+                    self.report(path[0], None,
+                                f"Unknown field {'/'.join(path)} is kept", True)
+                elif kind != expected:
+                    self.report(path[0] if depth else None, None,
+                                f"{'/'.join(path) or 'The file'} is a {kind}, "
+                                f"not a {expected}", False)
+                    if depth == 6:
+                        damaged = True
+                    elif depth >= 2 and path[1] == 'money':
+                        broken.add(path[0])
+                if expected is None or kind != expected:
+                    if event != 'value' and kind in ('map', 'array'):
+                        skipped = path
+                    continue
+
+            if depth == 1:
+                month = path[0]
+                if event == 'start_map':
+                    if month not in template:
+                        self.report(month, None, "Unknown month", False)
+                    summary[month] = {'money': {}}
+                    digests[month] = hashlib.sha256()
+                elif event == 'end_map':
+                    self.finish_month(month, summary[month], present, stored,
+                                      month in broken)
+            elif depth == 2:
+                if event == 'value':
+                    summary[path[0]][path[1]] = value
+                elif event == 'start_map' and path[1] == 'categoryBudgets':
+                    summary[path[0]]['categoryBudgets'] = {}
+            elif depth == 3:
+                if path[1] == 'categoryBudgets' and event == 'value':
+                    summary[path[0]]['categoryBudgets'][path[2]] = value
+                elif event == 'start_map':
+                    summary[path[0]]['money'][path[2]] = {
+                        'sumOfAmounts': 0.0, 'count': 0}
+            elif depth == 4 and event == 'value':
+                stored[path[0], path[2]] = value
+            elif depth == 5:
+                if event == 'start_map':
+                    expense, damaged = {}, False
+                    continue
+                if event == 'value':
+                    expense, damaged = self.check_fields(path, value)
+                if event in ('value', 'end_map'):
+                    self.finish_expense(path[0], path[2], expense, damaged)
+                    totals = summary[path[0]]['money'][path[2]]
+                    totals['sumOfAmounts'] += expense.get('amount', 0.0)
+                    totals['count'] += 1
+                    digests[path[0]].update(_canonical(path[2], expense))
+            elif depth == 6 and event == 'value':
+                expense[path[5]] = value
+
+        for month, details in summary.items():
+            checksum = details.get('checksum')
+            if checksum is not None and checksum != digests[month].hexdigest():
+                self.report(month, None, "The expenses were changed outside the app", True)
+        for month in template:
+            if month not in summary:
+                self.report(month, None, "The month is missing", True)
+
+    def finish_month(self, month, details, present, stored, broken):
+        """Checks the fields and aggregates of a month after reading it
+
+        Args:
+            month (str): The month
+            details (dict): The summary of the month with the computed sums
+            present (set): The paths of the fields found so far
+            stored (dict): The stored sumOfAmounts by (month, category)
+            broken (bool): True if the expenses of the month have an invalid
+                structure, so the aggregates are not compared
+        """
+        for field in ('money', 'totalSum', 'budget', 'categoryBudgets'):
+            if (month, field) not in present:
+                self.report(month, None, f"The field {field} is missing", True)
+        if broken:
+            return
+        total = 0.0
+        for category, totals in details['money'].items():
+            total += totals['sumOfAmounts']
+            if (month, 'money', category, 'items') not in present:
+                self.report(month, category, "The field items is missing", True)
+            if (month, 'money', category, 'sumOfAmounts') not in present:
+                self.report(month, category, "The field sumOfAmounts is missing", True)
+            elif (month, category) in stored and not math.isclose(
+                    stored[month, category], totals['sumOfAmounts'], abs_tol=TOLERANCE):
+                self.report(month, category,
+                            f"sumOfAmounts is {stored[month, category]}, "
+                            f"the items sum to {totals['sumOfAmounts']}", True)
+        if 'totalSum' in details and not math.isclose(details['totalSum'], total,
+                                                      abs_tol=TOLERANCE):
+            self.report(month, None, f"totalSum is {details['totalSum']}, "
+                        f"the categories sum to {total}", True)
+
+    def check_fields(self, path, fields):
+        """Checks the kinds of the fields of a decoded expense
+
+        Args:
+            path (tuple): The path of the expense
+            fields (dict): The decoded expense
+
+        Returns:
+            tuple: the fields that have the right kind and True if some
+            fields had the wrong kind
+        """
+        expense, damaged = {}, False
+        for field, value in fields.items():
+            expected = EXPENSE_FIELDS.get(field)
+            kind = _kind('value', value)
+            if expected is None:
+                self.report(path[0], None,
+                            f"Unknown field {'/'.join(path + (field,))} is kept", True)
+            elif kind != expected:
+                self.report(path[0], None, f"{'/'.join(path + (field,))} is a {kind}, "
+                            f"not a {expected}", False)
+                damaged = True
+            else:
+                expense[field] = value
+        return expense, damaged
+
+    def finish_expense(self, month, category, expense, damaged):
+        """Checks the fields of an expense after reading it
+
+        Args:
+            month (str): The month of the expense
+            category (str): The category of the expense
+            expense (dict): The fields of the expense that have the right kind
+            damaged (bool): True if some fields had the wrong kind
+        """
+        if 'amount' not in expense and not damaged:
+            self.report(month, category, f"An expense has no amount: {expense}", False)
+        if 'description' not in expense:
+            self.report(month, category, "An expense has no description", True)
+        if ('currency' in expense) != ('originalAmount' in expense):
+            self.report(month, category,
+                        f"An expense needs both currency and originalAmount: {expense}", False)
+
+    def repair(self, force=False):
+        """Checks the file and repairs it when all problems are repairable
+
+        Missing months and fields are added, with the months in calendar
+        order, the aggregates are recomputed from the items and the
+        checksums of all months are recorded. The file is written to a
+        temporary file that then replaces it, so a crash cannot leave it
+        half written. A valid file that had to be read gets a new summary
+        file, so it is trusted on the next start.
+
+        Args:
+            force (bool): Check the file even if it is trusted
+                (default: False)
+
+        Returns:
+            bool: True if the file is valid now
+        """
+        problems = self.check(force)
+        if not problems:
+            if self.summary is not None:
+                # The file is trusted from now on
+                write_summary(self.file_path, self.summary, verified=True)
+            return True
+        if not all(problem['repairable'] for problem in problems):
+            return False
+
+        with open(self.file_path) as file:
+            stored = json.load(file)
+        ledger = {month: stored[month] if month in stored else json.loads(json.dumps(details))
+                  for month, details in template.items()}
+        ledger.update(stored)
+        for details in ledger.values():
+            details.setdefault('money', {})
+            details.setdefault('budget', 0.0)
+            details.setdefault('categoryBudgets', {})
+            for expenses in details['money'].values():
+                expenses.setdefault('items', [])
+                for expense in expenses['items']:
+                    expense.setdefault('description', '')
+                expenses['sumOfAmounts'] = sum(
+                    expense['amount'] for expense in expenses['items'])
+            details['totalSum'] = sum(
+                expenses['sumOfAmounts'] for expenses in details['money'].values())
+            details['checksum'] = month_checksum(details)
+
+        checksum = write_ledger(self.file_path, ledger)
+        write_summary(self.file_path, build_summary(ledger), checksum, verified=True)
+        return True
+
+
+def check_ledger(file_path=None):
+    """Checks the JSON file of expenses on startup and repairs it if possible
+
+    Args:
+        file_path (str): The path of the JSON file of expenses
+            (default: expenses_file_path())
+
+    Returns:
+        list: the problems that could not be repaired
+    """
+    checker = IntegrityChecker(file_path)
+    if checker.repair():
+        return []
+    return [problem for problem in checker.problems if not problem['repairable']]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Checks the JSON file of expenses and repairs it")
+    parser.add_argument('file', nargs='?', help="JSON file of expenses")
+    parser.add_argument('--repair', action='store_true',
+                        help="repair the file when all problems are repairable")
+    arguments = parser.parse_args()
+    checker = IntegrityChecker(arguments.file)
+    valid = checker.repair(force=True) if arguments.repair else not checker.check(force=True)
+    for problem in checker.problems:
+        location = ', '.join(part for part in (problem['month'], problem['category']) if part)
+        print(f"{location or 'file'}: {problem['message']}"
+              f"{'' if problem['repairable'] else ' (not repairable)'}")
+    sys.exit(0 if valid else 1)
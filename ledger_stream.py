@@ -0,0 +1,203 @@
+import re
+import json
+
+
+TOKEN = re.compile(r'\s*(?:("(?:[^"\\]|\\.)*")|(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)'
+                   r'|(true|false|null)|([{}\[\]:,]))')
+NUMBER_CHARS = '0123456789.eE+-'
+LITERALS = {'true': True, 'false': False, 'null': None}
+CHUNK_SIZE = 64 * 1024
+DECODER = json.JSONDecoder()
+# The size a value decoded at once may reach before it is tokenized instead
+DECODE_LIMIT = 1024 * 1024
+# The expenses are the maps at this depth of the ledger
+EXPENSE_DEPTH = 5
+
+
+def iter_events(file, chunk_size=CHUNK_SIZE, decode_depth=None):
+    """Parses a JSON document incrementally into events
+
+    Only one chunk of the file and the path to the current value are kept in
+    memory, so the size of the document does not matter. Maps and arrays at
+    decode_depth are decoded at once by the C decoder of the json module
+    instead of token by token, which is much faster for many small values.
+
+    Args:
+        file (file): The text file to read
+        chunk_size (int): The number of characters read at once
+            (default: 64 KiB)
+        decode_depth (int): The length of the path of the values decoded
+            at once, as a single 'value' event (default: None for none)
+
+    Yields:
+        tuple: (path, event, value) where path is a tuple of the map keys
+        leading to the value ('item' for array elements) and event is one of
+        'start_map', 'map_key', 'end_map', 'start_array', 'end_array' or
+        'value'
+    """
+    buffer = ''
+    position = 0
+    eof = False
+    path = []
+    frames = []
+
+    while True:
+        match = TOKEN.match(buffer, position)
+        if match is not None and match.lastindex in (2, 3) and not eof:
+            # A number or literal touching the end of the buffer may continue
+            # in the next chunk
+            end = match.end()
+            if end == len(buffer) or buffer[end] in NUMBER_CHARS:
+                match = None
+        if match is not None and match.lastindex == 4 and match.group(4) in '{[' \
+                and len(path) == decode_depth:
+            start = match.start(4)
+            try:
+                value, end = DECODER.raw_decode(buffer, start)
+            except ValueError:
+                # Read on while the value may be cut off by the end of the
+                # buffer, then leave an invalid value to the tokenizer
+                if not eof and len(buffer) - start < max(16 * chunk_size, DECODE_LIMIT):
+                    match = None
+            else:
+                position = end
+                yield tuple(path), 'value', value
+                continue
+        if match is None:
+            if eof:
+                if buffer[position:].strip():
+                    raise ValueError(
+                        f"Invalid JSON near: {buffer[position:position + 20]!r}")
+                if frames:
+                    raise ValueError("Unexpected end of JSON document")
+                return
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        position = match.end()
+        string, number, literal, punctuation = match.groups()
+
+        if punctuation == '{':
+            yield tuple(path), 'start_map', None
+            frames.append([True, True, False])
+        elif punctuation == '}':
+            _, _, has_key = frames.pop()
+            if has_key:
+                path.pop()
+            yield tuple(path), 'end_map', None
+        elif punctuation == '[':
+            yield tuple(path), 'start_array', None
+            frames.append([False, False, False])
+            path.append('item')
+        elif punctuation == ']':
+            frames.pop()
+            path.pop()
+            yield tuple(path), 'end_array', None
+        elif punctuation == ',':
+            frames[-1][1] = frames[-1][0]
+        elif punctuation == ':':
+            continue
+        elif string is not None and frames and frames[-1][1]:
+            key = json.loads(string)
+            if frames[-1][2]:
+                path.pop()
+            yield tuple(path), 'map_key', key
+            path.append(key)
+            frames[-1][1] = False
+            frames[-1][2] = True
+        else:
+            if string is not None:
+                value = json.loads(string)
+            elif number is not None:
+                value = float(number) if any(
+                    c in number for c in '.eE') else int(number)
+            else:
+                value = LITERALS[literal]
+            yield tuple(path), 'value', value
+
+
+def iter_ledger(file, chunk_size=CHUNK_SIZE):
+    """Reads the month -> money -> category -> items schema incrementally
+
+    Args:
+        file (file): The text file of the expenses
+        chunk_size (int): The number of characters read at once
+            (default: 64 KiB)
+
+    Yields:
+        tuple: ('expense', month, category, expense) for every expense,
+        ('month', month, field, value) for the scalar fields of a month
+        such as 'budget' and 'totalSum' and ('category_budget', month,
+        category, value) for the budgets of the categories
+    """
+    expense = None
+    for path, event, value in iter_events(file, chunk_size, EXPENSE_DEPTH):
+        depth = len(path)
+        if depth == 5 and path[1] == 'money' and path[3] == 'items':
+            if event == 'value':
+                if isinstance(value, dict):
+                    yield 'expense', path[0], path[2], value
+            elif event == 'start_map':
+                expense = {}
+            elif event == 'end_map':
+                yield 'expense', path[0], path[2], expense
+                expense = None
+        elif depth == 6 and expense is not None and event == 'value':
+            expense[path[5]] = value
+        elif depth == 2 and event == 'value':
+            yield 'month', path[0], path[1], value
+        elif depth == 3 and path[1] == 'categoryBudgets' and event == 'value':
+            yield 'category_budget', path[0], path[2], value
+
+
+def iter_expenses(file_path, chunk_size=CHUNK_SIZE):
+    """Reads the expenses of a JSON file one by one
+
+    Args:
+        file_path (str): The path of the JSON file
+        chunk_size (int): The number of characters read at once
+            (default: 64 KiB)
+
+    Yields:
+        tuple: (month, category, expense) for every expense in the file
+    """
+    with open(file_path) as file:
+        for record in iter_ledger(file, chunk_size):
+            if record[0] == 'expense':
+                yield record[1:]
+
+
+def summarise(file_path, chunk_size=CHUNK_SIZE):
+    """Summarises a JSON file of expenses without loading the items
+
+    The sums are computed from the items while reading, the stored
+    'sumOfAmounts' and 'totalSum' fields are not trusted.
+
+    Args:
+        file_path (str): The path of the JSON file
+        chunk_size (int): The number of characters read at once
+            (default: 64 KiB)
+
+    Returns:
+        dict: the data of every month in the shape of the JSON file, where
+        each category holds 'sumOfAmounts' and the item 'count' instead of
+        the items
+    """
+    summary = {}
+    with open(file_path) as file:
+        for kind, month, key, value in iter_ledger(file, chunk_size):
+            details = summary.setdefault(
+                month, {'money': {}, 'totalSum': 0.0, 'budget': 0.0})
+            if kind == 'expense':
+                category = details['money'].setdefault(
+                    key, {'sumOfAmounts': 0.0, 'count': 0})
+                category['sumOfAmounts'] += value['amount']
+                category['count'] += 1
+                details['totalSum'] += value['amount']
+            elif kind == 'category_budget':
+                details.setdefault('categoryBudgets', {})[key] = value
+            elif key != 'totalSum':
+                details[key] = value
+    return summary
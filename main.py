@@ -1,11 +1,15 @@
 import os
 import sys
 import json
-from constants import data
+from constants import data, expenses_file_path
 from main_page import MainPage
 from editor_page import ExpenseTracker
 from helper_page import HelperPage
-from PyQt5.QtWidgets import QApplication
+from summary_cache import load_summary
+from integrity import check_ledger
+from financial_logic import FinancialLogic
+from budget_monitor import BudgetMonitor
+from PyQt5.QtWidgets import QApplication, QMessageBox
 
 
 class Application:
@@ -20,13 +24,33 @@ class Application:
         """
         Initializes the Application class.
 
-        It sets up the necessary objects and connects the signals and slots
-        for switching between pages.
+        It checks and repairs the JSON file of expenses, sets up the
+        necessary objects and connects the signals and slots for switching
+        between pages.
         """
-        self.app = QApplication(sys.argv)
-        self.editor_page = ExpenseTracker()
-        self.main_page = MainPage()
-        self.helper_page = HelperPage()
+        self.app = QApplication.instance() or QApplication(sys.argv)
+        problems = check_ledger()
+        if problems:
+            QMessageBox.warning(
+                None, "Damaged Expenses File",
+                "The expenses file has problems that must be fixed by hand:\n" +
+                "\n".join(problem['message'] for problem in problems[:10]))
+        self.logic = FinancialLogic()
+        self.editor_page = ExpenseTracker(self.logic)
+        self.main_page = MainPage(self.logic)
+        self.helper_page = HelperPage(self.logic)
+        self.logic.add_listener(self.helper_page.forecaster.observe)
+        # The duplicate filter is saved once, after the last write of the ledger
+        self.app.aboutToQuit.connect(self.editor_page.duplicates.flush)
+
+        self.load_data()
+        self.budget_monitor = BudgetMonitor()
+        self.budget_monitor.load(self.data)
+        self.logic.add_listener(self.budget_monitor.observe)
+        self.budget_monitor.threshold_crossed.connect(
+            self.main_page.show_budget_alert)
+        self.budget_monitor.threshold_crossed.connect(
+            self.helper_page.handle_threshold_crossed)
 
         self.editor_page.return_main_button.clicked.connect(
             self.switch_to_main_page)
@@ -65,8 +89,10 @@ class Application:
         """
         Switches to the helper page.
 
-        Closes the main page and shows the helper page.
+        Refreshes the spending forecast, closes the main page and shows the
+        helper page.
         """
+        self.helper_page.update_forecast()
         self.main_page.close()
         self.helper_page.show()
 
@@ -75,13 +101,13 @@ class Application:
         Loads data from a JSON file.
 
         The JSON file is expected to be named 'expenses.json' and located in
-        the same directory as the script file. The loaded data is stored in
-        the instance variable 'data'.
+        the same directory as the script file, unless the EXPENSES_FILE
+        environment variable points elsewhere. Only the summary of the file
+        (sums and budgets without the items) is read from its summary file
+        and stored in the instance variable 'data'.
         """
-        file_path = os.path.join(os.path.dirname(
-            os.path.abspath(__file__)), 'expenses.json')
-        with open(file_path) as file:
-            self.data = json.load(file)
+        file_path = expenses_file_path()
+        self.data = load_summary(file_path)
 
     def run(self):
         """
@@ -93,8 +119,7 @@ class Application:
 
 
 if __name__ == "__main__":
-    file_path = os.path.join(os.path.dirname(
-        os.path.abspath(__file__)), 'expenses.json')
+    file_path = expenses_file_path()
 
     if not os.path.exists(file_path):
         with open(file_path, "w") as file:
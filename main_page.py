@@ -1,10 +1,15 @@
-import os
-import json
 from datetime import datetime
+from constants import expenses_file_path
+from summary_cache import load_summary
+from financial_logic import FinancialLogic
+from report_page import ReportPage
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QColor, QPalette
 from PyQt5.QtChart import QChartView, QChart, QPieSeries
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QPushButton, QLineEdit, QMainWindow, QComboBox
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QPushButton, QLineEdit, QMainWindow, QComboBox, QMessageBox
+
+
+REPORT_ITEM = "Annual Report"
 
 
 class MainPage(QWidget):
@@ -16,20 +21,26 @@ class MainPage(QWidget):
     expenses. It also provides a button to switch to the editor page.
     """
 
-    def __init__(self):
+    def __init__(self, logic=None):
         """
         Initializes the MainPage class.
 
         Sets up the layout, loads data, creates the pie chart, total sum label,
         and edit button.
+
+        Args:
+            logic (FinancialLogic): The logic used to change the budget
+                (default: a new FinancialLogic)
         """
         super().__init__()
+        self.logic = logic or FinancialLogic()
         self.setWindowTitle("Financial Overview")
         self.resize(800, 600)
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
         self.chart = None
         self.editor_window = None
+        self.report_page = None
 
         palette = self.palette()
         palette.setColor(QPalette.Background, QColor(220, 240, 230))
@@ -52,20 +63,22 @@ class MainPage(QWidget):
         Loads data from a JSON file.
 
         The JSON file is expected to be named 'expenses.json' and located in
-        the same directory as the script file. The loaded data is stored in the
-        instance variable 'data'.
+        the same directory as the script file, unless the EXPENSES_FILE
+        environment variable points elsewhere. Only the summary of the file
+        (sums and budgets without the items) is read from its summary file
+        and stored in the instance variable 'data'.
         """
-        file_path = os.path.join(os.path.dirname(
-            os.path.abspath(__file__)), 'expenses.json')
-        with open(file_path) as file:
-            self.data = json.load(file)
+        file_path = expenses_file_path()
+        self.data = load_summary(file_path)
 
     def create_month_combobox(self):
         """
-        Creates and displays a combobox for selecting the month.
+        Creates and displays a combobox for selecting the month or the annual
+        report.
         """
         self.month_combobox = QComboBox()
         self.month_combobox.addItems(self.data.keys())
+        self.month_combobox.addItem(REPORT_ITEM)
         self.month_combobox.setCurrentText(self.current_month)
         self.month_combobox.currentTextChanged.connect(
             self.handle_month_combobox)
@@ -74,11 +87,30 @@ class MainPage(QWidget):
     def handle_month_combobox(self, month):
         """
         Handles the selection of a month in the combobox.
+
+        Selecting the annual report opens the report page and keeps the
+        previously selected month.
         """
+        if month == REPORT_ITEM:
+            self.month_combobox.blockSignals(True)
+            self.month_combobox.setCurrentText(self.current_month)
+            self.month_combobox.blockSignals(False)
+            self.show_report_page()
+            return
         self.current_month = month
         self.update_pie_chart()
         self.update_total_sum_label()
 
+    def show_report_page(self):
+        """
+        Shows the page with the annual and trend reports.
+        """
+        if self.report_page is None:
+            self.report_page = ReportPage()
+        else:
+            self.report_page.update_report()
+        self.report_page.show()
+
     def create_pie_chart(self):
         """
         Creates and displays the pie chart.
@@ -169,12 +201,30 @@ class MainPage(QWidget):
         """
         Handles the confirmation of the budget input.
         """
-        self.data[self.current_month]['budget'] = float(input_field.text())
+        budget = float(input_field.text())
+        self.logic.set_budget(budget, self.current_month)
+        self.data[self.current_month]['budget'] = budget
         self.update_data(self.data)
-        self.save_expenses_to_json()
         window.close()
         self.create_budget_label()
 
+    def show_budget_alert(self, month, category, threshold, spent, budget):
+        """
+        Shows a warning that the spending reached a share of a budget.
+
+        Args:
+            month (str): The month of the budget
+            category (str): The category of the budget, '' for the monthly
+                budget
+            threshold (int): The reached percentage of the budget
+            spent (float): The amount spent
+            budget (float): The budget
+        """
+        name = f"{category} budget" if category else "budget"
+        QMessageBox.warning(
+            self, "Budget Alert",
+            f"You have spent {threshold}% of the {name} for {month}: {spent:.2f} of {budget:.2f}.")
+
     def create_edit_button(self):
         """
         Creates and displays the button to switch to the editor page.
@@ -257,15 +307,3 @@ class MainPage(QWidget):
         else:
             total_sum_label.setText(
                 f"Total Sum: {self.data[self.current_month]['totalSum']}")
-
-    def save_expenses_to_json(self):
-        """Saves expenses to a JSON file
-
-        Args:
-            filename (str): The name of the JSON file
-        """
-        json_data = self.data
-        file_path = os.path.join(os.path.dirname(
-            os.path.abspath(__file__)), 'expenses.json')
-        with open(file_path, 'w') as file:
-            json.dump(json_data, file, indent=4)
@@ -0,0 +1,264 @@
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import statistics
+from time import perf_counter
+from datetime import datetime
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from constants import category_type, data  # noqa: E402
+from summary_cache import build_summary, write_summary  # noqa: E402
+from main import Application  # noqa: E402
+from PyQt5.QtCore import QEventLoop, QTimer  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Budgets in milliseconds for the worst stall of every interaction. They are
+# about twice the worst stall measured offscreen on one CPU at 100000
+# expenses, and at least 25 ms to absorb timer jitter. The first switch to
+# the helper page fits the forecast (about 200 ms) and the report page builds
+# the report synchronously (about 530 ms).
+DEFAULT_BUDGETS = {
+    'switch_to_main_page': 25,
+    'switch_to_editor_page': 25,
+    'switch_to_helper_page': 400,
+    'update_data': 25,
+    'change_month': 25,
+    'update_total_sum_label': 25,
+    'create_budget_label': 25,
+    'show_report_page': 1000,
+}
+
+
+def generate_ledger(file_path, size, seed=0):
+    """Writes a synthetic ledger with a number of expenses
+
+    The expenses are spread over all months and categories with random
+    amounts and dates in the current year. The summary file is written too,
+    as FinancialLogic would do.
+
+    Args:
+        file_path (str): The path of the JSON file to write
+        size (int): The number of expenses
+        seed (int): The seed of the random generator (default: 0)
+    """
+    generator = random.Random(seed)
+    ledger = json.loads(json.dumps(data))
+    months = list(ledger.keys())
+    categories = list(category_type.values())
+    year = datetime.now().year
+    for i in range(size):
+        month_index = generator.randrange(12)
+        month = months[month_index]
+        category = generator.choice(categories)
+        amount = round(generator.uniform(1, 500), 2)
+        expenses = ledger[month]['money'].setdefault(
+            category, {'items': [], 'sumOfAmounts': 0.0})
+        expenses['items'].append({
+            'amount': amount,
+            'description': f"{category} purchase {i % 997}",
+            'date': f"{year}-{month_index + 1:02d}-{generator.randint(1, 28):02d}"
+        })
+        expenses['sumOfAmounts'] += amount
+    for details in ledger.values():
+        details['totalSum'] = sum(expenses['sumOfAmounts']
+                                  for expenses in details['money'].values())
+        details['budget'] = 10000.0
+    with open(file_path, 'w') as file:
+        json.dump(ledger, file, indent=4)
+    write_summary(file_path, build_summary(ledger), verified=True)
+
+
+class StallMonitor:
+    """
+    Represents the measurement of event loop stalls.
+
+    A timer with a short interval runs while an interaction is measured. The
+    longest gap between two of its timeouts is the time the event loop could
+    not process events, including deferred layout and paint work.
+    """
+
+    def __init__(self, interval=1):
+        """
+        Initializes the StallMonitor class.
+
+        Args:
+            interval (int): The interval of the heartbeat timer in
+                milliseconds (default: 1)
+        """
+        self.timer = QTimer()
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.tick)
+        self.last = None
+        self.longest = 0.0
+
+    def start(self):
+        """Starts the heartbeat timer
+        """
+        self.last = perf_counter()
+        self.longest = 0.0
+        self.timer.start()
+
+    def tick(self):
+        """Records the gap since the previous heartbeat
+        """
+        now = perf_counter()
+        self.longest = max(self.longest, now - self.last)
+        self.last = now
+
+    def stop(self):
+        """Stops the heartbeat timer
+
+        Returns:
+            float: the longest stall in seconds
+        """
+        self.tick()
+        self.timer.stop()
+        return self.longest
+
+
+def measure(action, monitor, settle=20):
+    """Runs an interaction from the event loop and measures it
+
+    Args:
+        action (callable): The interaction to run
+        monitor (StallMonitor): The monitor of event loop stalls
+        settle (int): The milliseconds the event loop keeps running after
+            the interaction to process deferred events (default: 20)
+
+    Returns:
+        tuple: the latency of the call and the longest event loop stall, both
+        in milliseconds
+    """
+    loop = QEventLoop()
+    result = {}
+
+    def run():
+        start = perf_counter()
+        action()
+        result['latency'] = perf_counter() - start
+        QTimer.singleShot(settle, loop.quit)
+
+    monitor.start()
+    QTimer.singleShot(0, run)
+    loop.exec_()
+    stall = monitor.stop()
+    return result['latency'] * 1000, stall * 1000
+
+
+def interactions(application):
+    """Get the measured interactions of an application
+
+    Args:
+        application (Application): The application driven by the harness
+
+    Returns:
+        dict: the callable of every interaction by name
+    """
+    main_page = application.main_page
+    months = list(main_page.data.keys())
+
+    def change_month():
+        month = months[(months.index(main_page.current_month) + 1) % len(months)]
+        main_page.month_combobox.setCurrentText(month)
+
+    def show_report_page():
+        main_page.show_report_page()
+        main_page.report_page.close()
+
+    return {
+        'switch_to_main_page': application.switch_to_main_page,
+        'switch_to_editor_page': application.switch_to_editor_page,
+        'switch_to_helper_page': application.switch_to_helper_page,
+        'update_data': lambda: main_page.update_data(application.data),
+        'change_month': change_month,
+        'update_total_sum_label': main_page.update_total_sum_label,
+        'create_budget_label': main_page.create_budget_label,
+        'show_report_page': show_report_page,
+    }
+
+
+def run(sizes, budgets, repeat=5):
+    """Measures the interactions on synthetic ledgers of growing size
+
+    Args:
+        sizes (list): The numbers of expenses of the ledgers
+        budgets (dict): The budget in milliseconds of every interaction
+        repeat (int): The number of runs of every interaction (default: 5)
+
+    Returns:
+        list: the (size, interaction, median latency, worst latency, worst
+        stall, budget) rows of the measurements
+    """
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    rows = []
+    monitor = StallMonitor()
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'expenses.json')
+        os.environ['EXPENSES_FILE'] = file_path
+        for size in sizes:
+            generate_ledger(file_path, size)
+            application = Application()
+            for name, action in interactions(application).items():
+                latencies, stalls = [], []
+                for _ in range(repeat):
+                    latency, stall = measure(action, monitor)
+                    latencies.append(latency)
+                    stalls.append(stall)
+                rows.append((size, name, statistics.median(latencies),
+                             max(latencies), max(stalls), budgets.get(name)))
+            for widget in app.topLevelWidgets():
+                widget.close()
+    return rows
+
+
+def main(arguments=None):
+    """Runs the harness from the command line
+
+    Args:
+        arguments (list): The command line arguments (default: sys.argv)
+
+    Returns:
+        int: 0 if all interactions kept their budgets, otherwise 1
+    """
+    parser = argparse.ArgumentParser(
+        description="Measures UI latency on synthetic ledgers offscreen")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="numbers of expenses of the synthetic ledgers")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="runs of every interaction")
+    parser.add_argument('--config', help="JSON file with budgets in ms by interaction")
+    parser.add_argument('--budget', action='append', default=[],
+                        metavar='NAME=MS', help="budget of one interaction")
+    options = parser.parse_args(arguments)
+
+    budgets = dict(DEFAULT_BUDGETS)
+    if options.config:
+        with open(options.config) as file:
+            budgets.update(json.load(file))
+    for budget in options.budget:
+        name, value = budget.split('=')
+        budgets[name] = float(value)
+
+    failures = 0
+    print(f"{'size':>8} {'interaction':<24} {'median ms':>10} {'max ms':>10} "
+          f"{'stall ms':>10} {'budget':>8}")
+    for size, name, median, worst, stall, budget in run(options.sizes, budgets, options.repeat):
+        failed = budget is not None and stall > budget
+        failures += failed
+        print(f"{size:>8} {name:<24} {median:>10.1f} {worst:>10.1f} "
+              f"{stall:>10.1f} {budget or '-':>8}{'  FAIL' if failed else ''}")
+    if failures:
+        print(f"{failures} interactions exceeded their budget")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,367 @@
+import heapq
+from bisect import bisect_left, bisect_right, insort
+
+
+class LedgerIndex:
+    """
+    Represents the secondary indexes of the expenses.
+
+    The index keeps a hash index by category and by month and sorted indexes
+    by amount and by date, all keyed by the expense id. Expenses saved
+    before ids were introduced are keyed by the identity of their dict,
+    which is replaced on every change. The index is built once from the
+    ledger and then maintained from the changes reported by FinancialLogic.
+    """
+
+    def __init__(self, data=None):
+        """
+        Initializes the LedgerIndex class.
+
+        Args:
+            data (dict): The expense data to index (default: None for an
+                empty index)
+        """
+        self.rebuild(data or {})
+
+    def rebuild(self, data):
+        """Indexes all expenses of the expense data
+
+        Args:
+            data (dict): The expense data
+        """
+        self.records = {}
+        self.by_category = {}
+        self.by_month = {}
+        entries = []
+        for month, details in data.items():
+            for category, expenses in details['money'].items():
+                for expense in expenses['items']:
+                    entries.append((month, category, expense))
+        for month, category, expense in entries:
+            key = _key(expense)
+            self.records[key] = (month, category, expense)
+            self.by_category.setdefault(category, set()).add(key)
+            self.by_month.setdefault(month, set()).add(key)
+        self.amounts = sorted((expense['amount'], _key(expense))
+                              for _, _, expense in entries)
+        self.dates = sorted((expense['date'], _key(expense))
+                            for _, _, expense in entries if expense.get('date'))
+
+    def add(self, month, category, expense):
+        """Adds an expense to the indexes
+
+        Args:
+            month (str): The month of the expense
+            category (str): The category of the expense
+            expense (dict): The expense
+        """
+        key = _key(expense)
+        self.records[key] = (month, category, expense)
+        self.by_category.setdefault(category, set()).add(key)
+        self.by_month.setdefault(month, set()).add(key)
+        insort(self.amounts, (expense['amount'], key))
+        if expense.get('date'):
+            insort(self.dates, (expense['date'], key))
+
+    def remove(self, month, category, expense):
+        """Removes an expense from the indexes
+
+        Args:
+            month (str): The month of the expense
+            category (str): The category of the expense
+            expense (dict): The expense
+        """
+        key = _key(expense)
+        self.records.pop(key, None)
+        self.by_category.get(category, set()).discard(key)
+        self.by_month.get(month, set()).discard(key)
+        _discard(self.amounts, (expense['amount'], key))
+        if expense.get('date'):
+            _discard(self.dates, (expense['date'], key))
+
+    def observe(self, change):
+        """Updates the indexes with a change reported by FinancialLogic
+
+        Args:
+            change (dict): The change as reported by FinancialLogic listeners
+        """
+        action, month, category = change['action'], change['month'], change['category']
+        if action in ('edit', 'delete'):
+            old = change['previous'] if action == 'edit' else change['expense']
+            self.remove(month, category, old)
+        if action in ('add', 'edit'):
+            self.add(month, category, change['expense'])
+
+    def query(self):
+        """Starts a query on the indexed expenses
+
+        Returns:
+            Query: an empty query matching all expenses
+        """
+        return Query(self)
+
+
+class Query:
+    """
+    Represents a composable query on the expenses.
+
+    Filters are added with the builder methods and combined with AND. When
+    the query is iterated, the filter with the smallest estimated number of
+    candidates drives the scan through its index and the other filters are
+    checked on the candidates only. Results are produced lazily.
+    """
+
+    def __init__(self, index):
+        """
+        Initializes the Query class.
+
+        Args:
+            index (LedgerIndex): The indexes to query
+        """
+        self.index = index
+        self.months = None
+        self.categories = None
+        self.amount_range = None
+        self.date_range = None
+        self.text = None
+        self.order = None
+        self.descending = False
+        self.count = None
+
+    def in_months(self, *months):
+        """Keeps the expenses of some months
+
+        Returns:
+            Query: this query
+        """
+        self.months = set(months)
+        return self
+
+    def in_categories(self, *categories):
+        """Keeps the expenses of some categories
+
+        Returns:
+            Query: this query
+        """
+        self.categories = set(categories)
+        return self
+
+    def amount_between(self, low=None, high=None):
+        """Keeps the expenses with an amount in a range, bounds included
+
+        Args:
+            low (float): The lowest amount (default: no bound)
+            high (float): The highest amount (default: no bound)
+
+        Returns:
+            Query: this query
+        """
+        self.amount_range = (low, high)
+        return self
+
+    def date_between(self, start=None, end=None):
+        """Keeps the dated expenses in a range of dates, bounds included
+
+        Args:
+            start (str): The first date as YYYY-MM-DD (default: no bound)
+            end (str): The last date as YYYY-MM-DD (default: no bound)
+
+        Returns:
+            Query: this query
+        """
+        self.date_range = (start, end)
+        return self
+
+    def containing(self, text):
+        """Keeps the expenses whose description contains a text
+
+        Args:
+            text (str): The text, compared case-insensitively
+
+        Returns:
+            Query: this query
+        """
+        self.text = text.lower()
+        return self
+
+    def order_by(self, field, descending=False):
+        """Sorts the results
+
+        Args:
+            field (str): One of 'amount', 'date' or 'description'
+            descending (bool): Sort from the largest (default: False)
+
+        Returns:
+            Query: this query
+        """
+        self.order = field
+        self.descending = descending
+        return self
+
+    def limit(self, count):
+        """Limits the number of results
+
+        Args:
+            count (int): The maximum number of results
+
+        Returns:
+            Query: this query
+        """
+        self.count = count
+        return self
+
+    def plan(self):
+        """Chooses the index driving the query
+
+        Returns:
+            tuple: the name of the driving index ('category', 'month',
+            'amount', 'date' or 'scan') and its estimated number of
+            candidates
+        """
+        index = self.index
+        estimates = [('scan', len(index.records))]
+        if self.categories is not None:
+            estimates.append(('category', sum(
+                len(index.by_category.get(category, ())) for category in self.categories)))
+        if self.months is not None:
+            estimates.append(('month', sum(
+                len(index.by_month.get(month, ())) for month in self.months)))
+        if self.amount_range is not None:
+            start, end = _bounds(index.amounts, *self.amount_range)
+            estimates.append(('amount', end - start))
+        if self.date_range is not None:
+            start, end = _bounds(index.dates, *self.date_range)
+            estimates.append(('date', end - start))
+        # A sorted index matching the order avoids sorting when few results
+        # are asked for, so it is preferred on a tie
+        return min(estimates, key=lambda estimate: (estimate[1], estimate[0] != self.order))
+
+    def candidates(self, source):
+        """Get the ids of the candidates from the driving index
+
+        Args:
+            source (str): The name of the driving index
+
+        Returns:
+            iterable: the ids of the candidates, in index order for the
+            sorted indexes
+        """
+        index = self.index
+        if source == 'category':
+            return (key for category in self.categories
+                    for key in index.by_category.get(category, ()))
+        if source == 'month':
+            return (key for month in self.months
+                    for key in index.by_month.get(month, ()))
+        if source in ('amount', 'date'):
+            entries = index.amounts if source == 'amount' else index.dates
+            bounds = self.amount_range if source == 'amount' else self.date_range
+            start, end = _bounds(entries, *(bounds or (None, None)))
+            positions = range(end - 1, start - 1, -1) if self.descending \
+                and self.order == source else range(start, end)
+            return (entries[position][1] for position in positions)
+        return iter(list(index.records))
+
+    def matches(self, month, category, expense):
+        """Checks an expense against all filters
+
+        Args:
+            month (str): The month of the expense
+            category (str): The category of the expense
+            expense (dict): The expense
+
+        Returns:
+            bool: True if the expense passes all filters
+        """
+        if self.months is not None and month not in self.months:
+            return False
+        if self.categories is not None and category not in self.categories:
+            return False
+        if self.amount_range is not None:
+            low, high = self.amount_range
+            if (low is not None and expense['amount'] < low) or \
+                    (high is not None and expense['amount'] > high):
+                return False
+        if self.date_range is not None:
+            date = expense.get('date')
+            start, end = self.date_range
+            if not date or (start and date < start) or (end and date > end):
+                return False
+        if self.text is not None and self.text not in expense.get('description', '').lower():
+            return False
+        return True
+
+    def __iter__(self):
+        """Runs the query
+
+        Yields:
+            tuple: (month, category, expense) for every result
+        """
+        records = self.index.records
+        source, estimate = self.plan()
+        ordered_index = self.order == 'amount' or \
+            (self.order == 'date' and self.date_range is not None)
+        if ordered_index and source != self.order and self.count is not None \
+                and estimate * 4 >= len(records):
+            # Walking the sorted index of the order stops after `count`
+            # results, unless another filter is much more selective
+            source = self.order
+        results = (records[key] for key in self.candidates(source)
+                   if self.matches(*records[key]))
+
+        if self.order is not None and source != self.order:
+            def key(result):
+                value = result[2].get(self.order)
+                return (value is None, value if value is not None else '')
+            if self.count is not None:
+                pick = heapq.nlargest if self.descending else heapq.nsmallest
+                results = iter(pick(self.count, results, key=key))
+            else:
+                results = iter(
+                    sorted(results, key=key, reverse=self.descending))
+
+        for position, result in enumerate(results):
+            if self.count is not None and position >= self.count:
+                return
+            yield result
+
+
+def _key(expense):
+    """Get the key of an expense in the indexes
+
+    Args:
+        expense (dict): The expense
+
+    Returns:
+        str: the id of the expense, or the identity of its dict as text when
+        it has none
+    """
+    return expense.get('id') or f'@{id(expense)}'
+
+
+def _bounds(entries, low, high):
+    """Get the positions of a range of keys in a sorted index
+
+    Args:
+        entries (list): The sorted (key, id) entries
+        low: The lowest key, None for no bound
+        high: The highest key, None for no bound
+
+    Returns:
+        tuple: the start and end positions of the range
+    """
+    start = 0 if low is None else bisect_left(entries, (low,))
+    end = len(entries) if high is None else bisect_right(entries, (high, '\uffff'))
+    return start, end
+
+
+def _discard(entries, entry):
+    """Removes an entry from a sorted index if present
+
+    Args:
+        entries (list): The sorted entries
+        entry (tuple): The entry to remove
+    """
+    position = bisect_left(entries, entry)
+    if position < len(entries) and entries[position] == entry:
+        del entries[position]
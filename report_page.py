@@ -0,0 +1,123 @@
+from reports import ReportEngine
+from PyQt5.QtGui import QColor, QPalette
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QScrollArea
+
+
+class ReportPage(QWidget):
+    """
+    Represents the page with the annual and trend reports.
+
+    The page shows the totals per category and year, the month-over-month
+    changes and the top descriptions for a selected range of years.
+    """
+
+    def __init__(self, engine=None):
+        """
+        Initializes the ReportPage class.
+
+        Args:
+            engine (ReportEngine): The engine building the reports
+                (default: a new ReportEngine)
+        """
+        super().__init__()
+        self.setWindowTitle("Annual Reports")
+        self.resize(800, 600)
+        self.engine = engine or ReportEngine()
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
+
+        palette = self.palette()
+        palette.setColor(QPalette.Background, QColor(220, 240, 230))
+        self.setPalette(palette)
+
+        label = QLabel("Expenses by year")
+        label.setStyleSheet(
+            "color: #20553F; font-weight: bold; font-size: 24px;")
+        self.layout.addWidget(label)
+
+        self.create_range_comboboxes()
+
+        self.report_label = QLabel()
+        self.report_label.setStyleSheet("color: black;")
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setWidget(self.report_label)
+        self.layout.addWidget(scroll_area)
+
+        self.update_report()
+
+    def create_range_comboboxes(self):
+        """
+        Creates the comboboxes selecting the range of years and the button
+        building the report.
+        """
+        range_layout = QHBoxLayout()
+        self.start_year_combobox = QComboBox()
+        self.end_year_combobox = QComboBox()
+        range_layout.addWidget(QLabel("From:"))
+        range_layout.addWidget(self.start_year_combobox)
+        range_layout.addWidget(QLabel("To:"))
+        range_layout.addWidget(self.end_year_combobox)
+
+        build_button = QPushButton("Build Report")
+        build_button.setStyleSheet(
+            "background-color: #5DA56C; color: white; font-weight: bold; font-size: 14px;")
+        build_button.clicked.connect(self.handle_build_button)
+        range_layout.addWidget(build_button)
+        self.layout.addLayout(range_layout)
+
+    def update_report(self):
+        """
+        Builds the report of all years and refreshes the year comboboxes.
+        """
+        report = self.engine.build()
+        years = [str(year) for year in report['years']]
+        for combobox in (self.start_year_combobox, self.end_year_combobox):
+            combobox.blockSignals(True)
+            combobox.clear()
+            combobox.addItems(years)
+            combobox.blockSignals(False)
+        if years:
+            self.end_year_combobox.setCurrentText(years[-1])
+        self.show_report(report)
+
+    def handle_build_button(self):
+        """
+        Builds the report of the selected range of years.
+        """
+        if not self.start_year_combobox.count():
+            return
+        start_year = int(self.start_year_combobox.currentText())
+        end_year = int(self.end_year_combobox.currentText())
+        if start_year > end_year:
+            start_year, end_year = end_year, start_year
+        self.show_report(self.engine.build(start_year, end_year))
+
+    def show_report(self, report):
+        """
+        Displays a report in the report label.
+
+        Args:
+            report (dict): The report returned by ReportEngine.build()
+        """
+        if not report['years']:
+            self.report_label.setText("There are no expenses yet.")
+            return
+
+        lines = []
+        for year in report['years']:
+            lines.append(f"{year}")
+            categories = sorted(report['categories'][year].items(),
+                                key=lambda item: -item[1])
+            for category, total in categories:
+                lines.append(f"    {category}: {total:.2f}")
+            lines.append("    Top expenses:")
+            for description, count, total in report['descriptions'].get(year, []):
+                lines.append(
+                    f"        {description or '(no description)'}: {total:.2f} ({count}x)")
+
+        lines.append("Month over month:")
+        for year, month, total, delta in report['months']:
+            change = "" if delta is None else f" ({delta:+.2f})"
+            lines.append(f"    {month} {year}: {total:.2f}{change}")
+        self.report_label.setText("\n".join(lines))
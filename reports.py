@@ -0,0 +1,227 @@
+import os
+import re
+import json
+import mmap
+import calendar
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from ledger_stream import iter_expenses
+from constants import expenses_file_path
+
+
+MONTHS = list(calendar.month_name)[1:]
+# The keys of the months start the lines indented once in a ledger written
+# with indent=4, the strings of JSON cannot contain a raw line break
+MONTH_KEY = re.compile(rb'\n    ("(?:[^"\\\n]|\\.)*")\s*:\s*')
+
+
+def aggregate_partition(expenses):
+    """Aggregates one partition of expenses
+
+    The function runs in the worker processes, so it only takes and returns
+    plain picklable data.
+
+    Args:
+        expenses (list): The (year, month, category, amount, description)
+            tuples of the partition
+
+    Returns:
+        dict: the partial aggregates with the keys 'categories'
+        ((year, category) -> total), 'months' ((year, month index) -> total)
+        and 'descriptions' ((year, description) -> [count, total])
+    """
+    categories = defaultdict(float)
+    months = defaultdict(float)
+    descriptions = {}
+    for year, month, category, amount, description in expenses:
+        categories[year, category] += amount
+        months[year, month] += amount
+        entry = descriptions.setdefault((year, description), [0, 0.0])
+        entry[0] += 1
+        entry[1] += amount
+    return {'categories': dict(categories), 'months': dict(months),
+            'descriptions': descriptions}
+
+
+def merge_partials(partials):
+    """Merges the partial aggregates of several partitions
+
+    Args:
+        partials (iterable): The results of aggregate_partition()
+
+    Returns:
+        dict: the merged aggregates in the same shape
+    """
+    categories = Counter()
+    months = Counter()
+    descriptions = {}
+    for partial in partials:
+        categories.update(partial['categories'])
+        months.update(partial['months'])
+        for key, (count, total) in partial['descriptions'].items():
+            entry = descriptions.setdefault(key, [0, 0.0])
+            entry[0] += count
+            entry[1] += total
+    return {'categories': dict(categories), 'months': dict(months),
+            'descriptions': descriptions}
+
+
+def select_expenses(expenses, start_year=None, end_year=None):
+    """Turns the expenses of a range of years into the tuples to aggregate
+
+    Expenses without a date are counted in the current year.
+
+    Args:
+        expenses (iterable): The (month, category, expense) tuples
+        start_year (int): The first year to include (default: all)
+        end_year (int): The last year to include (default: all)
+
+    Yields:
+        tuple: (year, month index, category, amount, description)
+    """
+    current_year = datetime.now().year
+    for month, category, expense in expenses:
+        date = expense.get('date')
+        year = int(date[:4]) if date else current_year
+        if start_year is not None and year < start_year:
+            continue
+        if end_year is not None and year > end_year:
+            continue
+        yield (year, MONTHS.index(month) + 1, category, expense['amount'],
+               expense.get('description', '').strip())
+
+
+def month_spans(file_path):
+    """Finds the byte range of every month in the JSON file of expenses
+
+    Args:
+        file_path (str): The path of the JSON file of expenses
+
+    Returns:
+        list: the (month, start, end) of every month, empty when the file is
+        not laid out with indent=4
+    """
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            keys = [(json.loads(match.group(1)), match.start(), match.end())
+                    for match in MONTH_KEY.finditer(content)]
+            last = content.rfind(b'}')
+    ends = [start for _, start, _ in keys[1:]] + [last]
+    return [(month, start, end) for (month, _, start), end in zip(keys, ends)]
+
+
+def aggregate_month(file_path, month, start, end, start_year=None, end_year=None):
+    """Reads, parses and aggregates the expenses of one month
+
+    The function runs in the worker processes, every worker only reads the
+    byte range of its own month.
+
+    Args:
+        file_path (str): The path of the JSON file of expenses
+        month (str): The month
+        start (int): The offset of the value of the month
+        end (int): The offset after the value of the month
+        start_year (int): The first year to include (default: all)
+        end_year (int): The last year to include (default: all)
+
+    Returns:
+        dict: the partial aggregates of the month
+    """
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        details = json.loads(file.read(end - start).rstrip().rstrip(b','))
+    expenses = ((month, category, expense)
+                for category, entry in details['money'].items()
+                for expense in entry['items'])
+    return aggregate_partition(select_expenses(expenses, start_year, end_year))
+
+
+class ReportEngine:
+    """
+    Represents the engine building annual and trend reports.
+
+    Every month of the JSON file is read, parsed and aggregated by its own
+    worker process of a ProcessPoolExecutor, so building the report of a
+    large ledger scales across the CPUs. Small ledgers, and files not laid
+    out with indent=4, are streamed and aggregated in the calling process.
+    The partial aggregates are merged into the report.
+    """
+
+    def __init__(self, file_path=None, workers=None, parallel_threshold=8 * 1024 * 1024):
+        """
+        Initializes the ReportEngine class.
+
+        Args:
+            file_path (str): The path of the JSON file of expenses
+                (default: expenses_file_path())
+            workers (int): The number of worker processes (default: the
+                number of CPUs)
+            parallel_threshold (int): The minimum size in bytes of the file
+                for which the months are read in worker processes
+                (default: 8 MiB)
+        """
+        self.file_path = file_path or expenses_file_path()
+        self.workers = workers or os.cpu_count() or 1
+        self.parallel_threshold = parallel_threshold
+
+    def aggregate(self, start_year=None, end_year=None):
+        """Aggregates the expenses of a range of years, in parallel for large ledgers
+
+        Args:
+            start_year (int): The first year to include (default: all)
+            end_year (int): The last year to include (default: all)
+
+        Returns:
+            dict: the merged aggregates
+        """
+        spans = []
+        if self.workers > 1 and os.path.getsize(self.file_path) >= self.parallel_threshold:
+            spans = month_spans(self.file_path)
+        if len(spans) < 2:
+            return aggregate_partition(select_expenses(
+                iter_expenses(self.file_path), start_year, end_year))
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(spans))) as executor:
+            futures = [executor.submit(aggregate_month, self.file_path, month,
+                                       start, end, start_year, end_year)
+                       for month, start, end in spans]
+            return merge_partials(future.result() for future in futures)
+
+    def build(self, start_year=None, end_year=None, top=10):
+        """Builds the report of a range of years
+
+        Args:
+            start_year (int): The first year of the report (default: all)
+            end_year (int): The last year of the report (default: all)
+            top (int): The number of top descriptions per year (default: 10)
+
+        Returns:
+            dict: the report with the keys 'years' (sorted list),
+            'categories' (year -> category -> total), 'months' (list of
+            (year, month, total, delta to the previous month)) and
+            'descriptions' (year -> list of (description, count, total))
+        """
+        aggregates = self.aggregate(start_year, end_year)
+
+        categories = defaultdict(dict)
+        for (year, category), total in aggregates['categories'].items():
+            categories[year][category] = total
+
+        months = []
+        previous = None
+        for (year, month_index), total in sorted(aggregates['months'].items()):
+            delta = None if previous is None else total - previous
+            months.append((year, MONTHS[month_index - 1], total, delta))
+            previous = total
+
+        descriptions = defaultdict(list)
+        for (year, description), (count, total) in aggregates['descriptions'].items():
+            descriptions[year].append((description, count, total))
+        for year in descriptions:
+            descriptions[year] = sorted(
+                descriptions[year], key=lambda entry: -entry[2])[:top]
+
+        return {'years': sorted(categories), 'categories': dict(categories),
+                'months': months, 'descriptions': dict(descriptions)}
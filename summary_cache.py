@@ -0,0 +1,143 @@
+import os
+import json
+import hashlib
+import tempfile
+from ledger_stream import summarise
+
+
+SUMMARY_VERSION = 1
+
+
+def summary_path(file_path):
+    """Get the path of the summary file kept next to a JSON file of expenses
+
+    Args:
+        file_path (str): The path of the JSON file of expenses
+
+    Returns:
+        str: the path of the summary file
+    """
+    root, _ = os.path.splitext(file_path)
+    return root + '.summary.json'
+
+
+def file_checksum(file_path):
+    """Calculates the SHA-256 checksum of a file
+
+    Args:
+        file_path (str): The path of the file
+
+    Returns:
+        str: the hexadecimal checksum
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_summary(data):
+    """Builds the summary of expense data held in memory
+
+    Args:
+        data (dict): The expense data loaded from the JSON file
+
+    Returns:
+        dict: the data of every month where each category holds
+        'sumOfAmounts' and the item 'count' instead of the items
+    """
+    summary = {}
+    for month, details in data.items():
+        money = {category: {'sumOfAmounts': expenses['sumOfAmounts'],
+                            'count': len(expenses['items'])}
+                 for category, expenses in details['money'].items()}
+        summary[month] = dict(details, money=money)
+    return summary
+
+
+def write_ledger(file_path, data):
+    """Writes a JSON file of expenses atomically
+
+    The data is written to a temporary file in the same directory, flushed
+    to disk and then moved over the file, so a crash leaves either the old
+    or the new file.
+
+    Args:
+        file_path (str): The path of the JSON file of expenses
+        data (dict): The expense data
+
+    Returns:
+        str: the SHA-256 checksum of the written file
+    """
+    content = json.dumps(data, indent=4).encode()
+    directory = os.path.dirname(os.path.abspath(file_path))
+    with tempfile.NamedTemporaryFile('wb', dir=directory, suffix='.tmp',
+                                     delete=False) as file:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    if os.path.exists(file_path):
+        os.chmod(file.name, os.stat(file_path).st_mode & 0o777)
+    os.replace(file.name, file_path)
+    return hashlib.sha256(content).hexdigest()
+
+
+def write_summary(file_path, summary, checksum=None, verified=False):
+    """Writes the summary file of a JSON file of expenses
+
+    Args:
+        file_path (str): The path of the JSON file of expenses
+        summary (dict): The summary as returned by build_summary()
+        checksum (str): The checksum of the JSON file, calculated when not
+            given (default: None)
+        verified (bool): True if the JSON file passed the integrity check
+            or was derived from a file that did (default: False)
+    """
+    stat = os.stat(file_path)
+    source = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': checksum or file_checksum(file_path),
+        'verified': verified
+    }
+    with open(summary_path(file_path), 'w') as file:
+        json.dump({'version': SUMMARY_VERSION, 'source': source,
+                  'months': summary}, file, indent=4)
+
+
+def load_summary(file_path):
+    """Loads the summary of a JSON file of expenses
+
+    The summary file is trusted when the size and modification time of the
+    JSON file are unchanged. Otherwise the checksum of the JSON file is
+    compared, and only when it differs the summary is rebuilt with a full
+    streaming pass over the file.
+
+    Args:
+        file_path (str): The path of the JSON file of expenses
+
+    Returns:
+        dict: the data of every month where each category holds
+        'sumOfAmounts' and the item 'count' instead of the items
+    """
+    try:
+        with open(summary_path(file_path)) as file:
+            cached = json.load(file)
+    except (OSError, ValueError):
+        cached = None
+
+    if cached is not None and cached.get('version') == SUMMARY_VERSION:
+        stat = os.stat(file_path)
+        source = cached['source']
+        if source['size'] == stat.st_size and source['mtime_ns'] == stat.st_mtime_ns:
+            return cached['months']
+        checksum = file_checksum(file_path)
+        if source['sha256'] == checksum:
+            write_summary(file_path, cached['months'], checksum,
+                          source.get('verified', False))
+            return cached['months']
+
+    summary = summarise(file_path)
+    write_summary(file_path, summary)
+    return summary
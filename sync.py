@@ -0,0 +1,348 @@
+import os
+import json
+import uuid
+from datetime import datetime
+from urllib.request import Request, urlopen
+
+
+def change_key(change):
+    """Get the key deciding which of two concurrent changes wins
+
+    The change with the higher version wins, ties are broken by the time of
+    the change and then by the device id, so every device and the server
+    resolve a conflict the same way.
+
+    Args:
+        change (dict): The change
+
+    Returns:
+        tuple: the comparable key of the change
+    """
+    return change['version'], change['updated'], change['device']
+
+
+class SyncClient:
+    """
+    Represents the delta synchronisation of the expenses with a sync server.
+
+    The client listens to the changes of FinancialLogic and keeps an outbox
+    with the latest change of every record changed since the last sync.
+    Synchronising pulls only the changes the server received since the last
+    pull and pushes only the outbox. Pulled changes are applied in memory
+    and the ledger is saved once per sync. Once the device synced, local
+    changes are appended to a journal next to the sync state, which is only
+    rewritten by a sync. The versions of the records are kept in a log that
+    a sync only appends its changed versions to.
+    """
+
+    def __init__(self, logic, server_url, file_path=None):
+        """
+        Initializes the SyncClient class.
+
+        Args:
+            logic (FinancialLogic): The logic holding the expenses
+            server_url (str): The URL of the sync server
+            file_path (str): The path of the JSON file of expenses
+                (default: the file of the logic)
+        """
+        self.logic = logic
+        self.server_url = server_url.rstrip('/')
+        root = os.path.splitext(file_path or logic.file_path)[0]
+        self.state_path = root + '.sync.json'
+        self.journal_path = root + '.sync.log'
+        self.versions_path = root + '.sync.versions'
+        self.applying = False
+        self.locations = None
+        self.changed = set()
+        self.logged = 0
+
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as file:
+                state = json.load(file)
+        else:
+            state = {'device': uuid.uuid4().hex, 'last_seq': 0,
+                     'outbox': {}, 'initialised': False}
+        self.device = state['device']
+        self.initialised = state['initialised']
+        self.last_seq = state['last_seq']
+        self.outbox = state['outbox']
+        # Older states kept the versions, they move to the log on the next save
+        self.versions = state.get('versions', {})
+        self.changed.update(self.versions)
+        self.load_versions()
+        self.replay_journal()
+
+        self.logic.add_listener(self.observe)
+
+    def replay_journal(self):
+        """Adds the local changes journaled since the last sync to the outbox
+        """
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path) as file:
+            for line in file:
+                try:
+                    change = json.loads(line)
+                except ValueError:
+                    # The last line may be cut off by a crash
+                    break
+                self.outbox[change['id']] = change
+                self.versions[change['id']] = max(
+                    self.versions.get(change['id'], 0), change['version'])
+                self.changed.add(change['id'])
+
+    def load_versions(self):
+        """Reads the versions of the records saved by the previous syncs
+        """
+        if not os.path.exists(self.versions_path):
+            return
+        with open(self.versions_path) as file:
+            for line in file:
+                try:
+                    versions = json.loads(line)
+                except ValueError:
+                    # The last line may be cut off by a crash
+                    break
+                self.versions.update(versions)
+                self.logged += len(versions)
+
+    def save_versions(self):
+        """Saves the versions of the records changed since the last save
+
+        The changed versions are appended to the log as one line. Once the
+        log holds twice as many entries as there are records, it is
+        rewritten with the current versions only.
+        """
+        changed = {record_id: self.versions[record_id] for record_id in self.changed}
+        self.changed = set()
+        if self.logged + len(changed) > 2 * len(self.versions):
+            temporary = self.versions_path + '.tmp'
+            with open(temporary, 'w') as file:
+                file.write(json.dumps(self.versions) + '\n')
+            os.replace(temporary, self.versions_path)
+            self.logged = len(self.versions)
+        elif changed:
+            with open(self.versions_path, 'a') as file:
+                file.write(json.dumps(changed) + '\n')
+            self.logged += len(changed)
+
+    def journal(self, change):
+        """Appends a local change to the journal
+
+        Args:
+            change (dict): The change added to the outbox
+        """
+        with open(self.journal_path, 'a') as file:
+            file.write(json.dumps(change) + '\n')
+
+    def save_state(self):
+        """Saves the sync state next to the ledger and empties the journal
+        """
+        self.save_versions()
+        state = {'device': self.device, 'last_seq': self.last_seq,
+                 'outbox': self.outbox, 'initialised': self.initialised}
+        with open(self.state_path, 'w') as file:
+            json.dump(state, file, indent=4)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def make_change(self, record_id, op, month, category=None, record=None):
+        """Creates a local change with the next version of a record
+
+        Args:
+            record_id (str): The id of the record
+            op (str): One of 'upsert', 'delete', 'budget' or 'category_budget'
+            month (str): The month of the record
+            category (str): The category of an expense or a category budget
+                (default: None)
+            record (dict): The expense, or {'budget': amount} for a budget
+                (default: None)
+
+        Returns:
+            dict: the change
+        """
+        version = self.versions.get(record_id, 0) + 1
+        self.versions[record_id] = version
+        self.changed.add(record_id)
+        return {'id': record_id, 'op': op, 'month': month,
+                'category': category, 'record': record, 'version': version,
+                'updated': datetime.now().isoformat(), 'device': self.device}
+
+    def observe(self, change):
+        """Adds a change reported by FinancialLogic to the outbox
+
+        Changes made before the first sync are not recorded, the first sync
+        uploads every record with enqueue_unsynced().
+
+        Args:
+            change (dict): The change as reported by FinancialLogic listeners
+        """
+        if self.applying or not self.initialised:
+            return
+        action, month = change['action'], change['month']
+        if action == 'budget':
+            record_id = f'budget:{month}'
+            local = self.make_change(
+                record_id, 'budget', month, record=change['expense'])
+        elif action == 'category_budget':
+            record_id = f'category_budget:{month}:{change["category"]}'
+            local = self.make_change(
+                record_id, 'category_budget', month, change['category'], change['expense'])
+        else:
+            expense = change['expense']
+            if 'id' not in expense:
+                return
+            op = 'delete' if action == 'delete' else 'upsert'
+            record_id = expense['id']
+            local = self.make_change(
+                record_id, op, month, change['category'], expense)
+            if self.locations is not None:
+                if op == 'delete':
+                    self.locations.pop(record_id, None)
+                else:
+                    self.locations[record_id] = (month, change['category'])
+        self.outbox[record_id] = local
+        self.journal(local)
+
+    def locate(self, record_id):
+        """Finds an expense in the ledger by its id
+
+        The month and category of every id are indexed once, so only the
+        items of one category are searched for the position.
+
+        Args:
+            record_id (str): The id of the expense
+
+        Returns:
+            tuple: the month, category and index of the expense, or None
+        """
+        if self.locations is None:
+            self.locations = {}
+            for month, details in self.logic.load_data().items():
+                for category, expenses in details['money'].items():
+                    for expense in expenses['items']:
+                        if 'id' in expense:
+                            self.locations[expense['id']] = (month, category)
+        location = self.locations.get(record_id)
+        if location is None:
+            return None
+        month, category = location
+        items = self.logic.load_expenses(month).get(
+            category, {'items': []})['items']
+        for index, expense in enumerate(items):
+            if expense.get('id') == record_id:
+                return month, category, index
+        return None
+
+    def enqueue_unsynced(self):
+        """Adds every expense and budget that was never synced to the outbox
+
+        This is done once, on the first sync of the device, so the records
+        created before syncing was set up are uploaded too.
+        """
+        self.logic.assign_ids()
+        self.locations = None
+        for month, details in self.logic.load_data().items():
+            record_id = f'budget:{month}'
+            if details['budget'] and record_id not in self.versions:
+                self.outbox[record_id] = self.make_change(
+                    record_id, 'budget', month, record={'budget': details['budget']})
+            for category, budget in details.get('categoryBudgets', {}).items():
+                record_id = f'category_budget:{month}:{category}'
+                if record_id not in self.versions:
+                    self.outbox[record_id] = self.make_change(
+                        record_id, 'category_budget', month, category, {'budget': budget})
+            for category, expenses in details['money'].items():
+                for expense in expenses['items']:
+                    if expense['id'] not in self.versions:
+                        self.outbox[expense['id']] = self.make_change(
+                            expense['id'], 'upsert', month, category, expense)
+        self.initialised = True
+
+    def apply_remote(self, change):
+        """Applies a change received from the server to the ledger
+
+        Args:
+            change (dict): The remote change
+        """
+        self.applying = True
+        try:
+            if change['op'] == 'budget':
+                self.logic.change_budget(
+                    change['month'], change['record']['budget'])
+                return
+            if change['op'] == 'category_budget':
+                self.logic.change_category_budget(
+                    change['month'], change['category'], change['record']['budget'])
+                return
+            location = self.locate(change['id'])
+            if change['op'] == 'delete':
+                if location is not None:
+                    self.logic.remove_expense(*location)
+                    self.locations.pop(change['id'], None)
+                return
+            if location is not None and location[:2] == (change['month'], change['category']):
+                self.logic.replace_expense(*location, change['record'])
+                return
+            if location is not None:
+                self.logic.remove_expense(*location)
+            self.logic.insert_expense(
+                change['month'], change['category'], change['record'])
+            self.locations[change['id']] = (change['month'], change['category'])
+        finally:
+            self.applying = False
+
+    def request(self, path, body=None):
+        """Sends a request to the sync server
+
+        Args:
+            path (str): The path of the endpoint
+            body (dict): The JSON body of a POST request (default: None for a
+                GET request)
+
+        Returns:
+            dict: the JSON response
+        """
+        data = None if body is None else json.dumps(body).encode()
+        request = Request(self.server_url + path, data=data,
+                          headers={'Content-Type': 'application/json'})
+        with urlopen(request, timeout=30) as response:
+            return json.loads(response.read().decode())
+
+    def sync(self):
+        """Pulls the remote changes and pushes the local ones
+
+        A remote change loses against a pending local change of the same
+        record with a higher change_key(), which is then pushed instead.
+
+        Returns:
+            tuple: the number of pulled and pushed changes
+        """
+        if not self.initialised:
+            self.enqueue_unsynced()
+        response = self.request(
+            f'/changes?since={self.last_seq}&device={self.device}')
+        pulled = 0
+        with self.logic.batch():
+            for change in response['changes']:
+                local = self.outbox.get(change['id'])
+                if local is not None and change_key(local) > change_key(change):
+                    continue
+                self.outbox.pop(change['id'], None)
+                self.versions[change['id']] = max(
+                    self.versions.get(change['id'], 0), change['version'])
+                self.changed.add(change['id'])
+                self.apply_remote(change)
+                pulled += 1
+        self.last_seq = response['last_seq']
+        if pulled:
+            # The positions recorded by the undo history may have moved
+            self.logic.history.clear()
+
+        pushed = len(self.outbox)
+        if self.outbox:
+            self.request('/push', {'device': self.device,
+                                   'changes': list(self.outbox.values())})
+            self.outbox = {}
+        self.save_state()
+        return pulled, pushed
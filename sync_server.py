@@ -0,0 +1,158 @@
+import os
+import json
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from sync import change_key
+
+
+class SyncServer:
+    """
+    Represents the state of the reference sync server.
+
+    The server keeps the winning change of every record and a feed of the
+    accepted changes numbered by a sequence. Devices pull the part of the
+    feed after their last sequence and push their pending changes.
+    """
+
+    def __init__(self, data_path=None):
+        """
+        Initializes the SyncServer class.
+
+        Args:
+            data_path (str): The path of the JSON file persisting the state,
+                kept in memory only when not given (default: None)
+        """
+        self.data_path = data_path
+        self.lock = threading.Lock()
+        self.records = {}
+        self.feed = []
+        if data_path and os.path.exists(data_path):
+            with open(data_path) as file:
+                self.feed = json.load(file)['feed']
+            for seq, change in self.feed:
+                self.records[change['id']] = change
+
+    def save(self):
+        """Saves the feed to the data file, if any
+        """
+        if self.data_path:
+            with open(self.data_path, 'w') as file:
+                json.dump({'feed': self.feed}, file)
+
+    def push(self, changes):
+        """Accepts the changes that win against the stored ones
+
+        Args:
+            changes (list): The changes pushed by a device
+
+        Returns:
+            int: the number of accepted changes
+        """
+        accepted = 0
+        with self.lock:
+            for change in changes:
+                current = self.records.get(change['id'])
+                if current is not None and change_key(current) >= change_key(change):
+                    continue
+                self.records[change['id']] = change
+                self.feed.append((len(self.feed) + 1, change))
+                accepted += 1
+            if accepted:
+                self.save()
+        return accepted
+
+    def changes_since(self, seq, device=None):
+        """Get the accepted changes after a sequence
+
+        Only the latest change of every record is returned, and the changes
+        made by the asking device itself are left out.
+
+        Args:
+            seq (int): The last sequence known to the device
+            device (str): The id of the asking device (default: None)
+
+        Returns:
+            dict: the 'changes' and the 'last_seq' of the feed
+        """
+        with self.lock:
+            latest = {}
+            for _, change in self.feed[seq:]:
+                latest[change['id']] = change
+            changes = [change for change in latest.values()
+                       if change['device'] != device
+                       and self.records[change['id']] is change]
+            return {'changes': changes, 'last_seq': len(self.feed)}
+
+
+class SyncRequestHandler(BaseHTTPRequestHandler):
+    """
+    Represents the HTTP interface of the reference sync server.
+
+    GET /changes?since=<seq>&device=<id> returns the feed after a sequence,
+    POST /push with {'device': <id>, 'changes': [...]} stores changes.
+    """
+
+    server_state = None
+
+    def send_json(self, body, status=200):
+        """Sends a JSON response
+
+        Args:
+            body (dict): The body of the response
+            status (int): The HTTP status (default: 200)
+        """
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/changes':
+            self.send_json({'error': 'not found'}, 404)
+            return
+        query = parse_qs(url.query)
+        seq = int(query.get('since', ['0'])[0])
+        device = query.get('device', [None])[0]
+        self.send_json(self.server_state.changes_since(seq, device))
+
+    def do_POST(self):
+        if self.path != '/push':
+            self.send_json({'error': 'not found'}, 404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length).decode())
+        accepted = self.server_state.push(body['changes'])
+        self.send_json({'accepted': accepted})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host='127.0.0.1', port=8765, data_path=None):
+    """Runs the reference sync server until it is interrupted
+
+    Args:
+        host (str): The host to listen on (default: '127.0.0.1')
+        port (int): The port to listen on (default: 8765)
+        data_path (str): The path of the JSON file persisting the state
+            (default: None)
+    """
+    handler = type('Handler', (SyncRequestHandler,),
+                   {'server_state': SyncServer(data_path)})
+    with ThreadingHTTPServer((host, port), handler) as httpd:
+        httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Reference server for syncing expenses between devices")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--data', help="JSON file persisting the changes")
+    arguments = parser.parse_args()
+    serve(arguments.host, arguments.port, arguments.data)
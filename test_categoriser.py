@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+import unittest
+from categoriser import Categoriser, rules_file_path
+
+
+class CategoriserTest(unittest.TestCase):
+    """
+    Checks the matching and learning of categorisation rules.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.rules_path = rules_file_path(os.path.join(self.directory, 'expenses.json'))
+        self.categoriser = Categoriser(self.rules_path)
+        for keyword, category in (('coffee', 'Food'), ('coffee beans', 'Groceries'),
+                                  ('bus', 'Transport'), ("mcdonald's", 'Food')):
+            self.categoriser.add_rule(keyword, category)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_longest_keyword_on_word_boundaries_wins(self):
+        self.assertEqual(self.categoriser.categorise('Coffee  Beans 1kg'), 'Groceries')
+        self.assertEqual(self.categoriser.categorise('coffee beansprout'), 'Food')
+        self.assertEqual(self.categoriser.categorise("Lunch at McDonald's"), 'Food')
+        self.assertEqual(self.categoriser.categorise('bus-ticket'), 'Transport')
+        self.assertIsNone(self.categoriser.categorise('business lunch'))
+        self.assertIsNone(self.categoriser.categorise('bus2 ticket'))
+        self.assertEqual(self.categoriser.categorise_many(['coffee', 'rent']), ['Food', None])
+
+    def test_rules_change_the_matches(self):
+        self.assertEqual(self.categoriser.categorise('bus to work'), 'Transport')
+        self.categoriser.add_rule('bus to work', 'Commute')
+        self.assertEqual(self.categoriser.categorise('bus to work'), 'Commute')
+        self.categoriser.remove_rule('bus to work')
+        self.categoriser.remove_rule('bus')
+        self.assertIsNone(self.categoriser.categorise('bus to work'))
+        self.assertIsNone(Categoriser(os.path.join(self.directory, 'none.json')).categorise('bus'))
+
+    def test_learned_rules_are_saved(self):
+        self.assertTrue(self.categoriser.learn('Tesco Express 1234', 'Groceries'))
+        self.assertFalse(self.categoriser.learn('tesco express 99', 'Groceries'))
+        self.assertEqual(Categoriser(self.rules_path).categorise('TESCO EXPRESS'), 'Groceries')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import json
+import random
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+from datetime import datetime
+from difflib import SequenceMatcher
+from unittest import mock
+from constants import data
+from dedup import DuplicateDetector
+from financial_logic import FinancialLogic
+
+
+class DuplicateDetectorTest(unittest.TestCase):
+    """
+    Compares the duplicate detection with a brute force search.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'expenses.json')
+        generator = random.Random(0)
+        ledger = json.loads(json.dumps(data))
+        items = ledger['March']['money'].setdefault(
+            'Food', {'items': [], 'sumOfAmounts': 0.0})['items']
+        for _ in range(300):
+            items.append({
+                'amount': generator.choice([3.5, 4.0]),
+                'description': generator.choice(['Coffee', 'coffee shop', 'Coffe', 'tea']),
+                'date': f'2025-{generator.randint(1, 3):02d}-{generator.randint(1, 28):02d}'})
+        for _ in range(10):
+            items.append({'amount': 3.5, 'description': 'coffee'})
+        self.items = items
+        with open(self.file_path, 'w') as file:
+            json.dump(ledger, file, indent=4)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_near_duplicates_match_brute_force(self):
+        def close(first, second):
+            if not first or not second:
+                return not first and not second
+            delta = datetime.strptime(first, "%Y-%m-%d") - datetime.strptime(second, "%Y-%m-%d")
+            return abs(delta.days) <= 3
+
+        def key(first, second):
+            return frozenset((json.dumps(first, sort_keys=True), json.dumps(second, sort_keys=True)))
+
+        expected = Counter()
+        for i, first in enumerate(self.items):
+            for second in self.items[i + 1:]:
+                if first['amount'] != second['amount'] or \
+                        not close(first.get('date'), second.get('date')):
+                    continue
+                texts = first['description'].lower(), second['description'].lower()
+                if max(SequenceMatcher(None, *texts).ratio(),
+                       SequenceMatcher(None, *reversed(texts)).ratio()) >= 0.8:
+                    expected[key(first, second)] += 1
+
+        found = Counter(key(first, second) for _, _, first, second in
+                        DuplicateDetector(self.file_path).near_duplicates())
+        self.assertEqual(found, expected)
+
+    def test_filter_is_saved_once_after_a_batch(self):
+        logic = FinancialLogic(file_path=self.file_path)
+        logic.current_month = 'March'
+        detector = DuplicateDetector(self.file_path)
+        logic.add_listener(detector.observe)
+        with mock.patch.object(detector, 'save', wraps=detector.save) as save:
+            with logic.batch():
+                for index in range(3):
+                    logic.add_expense(1.0 + index, 'Food', f'item {index}')
+            self.assertEqual(save.call_count, 0)
+            detector.flush()
+            self.assertEqual(save.call_count, 1)
+
+        with mock.patch.object(DuplicateDetector, 'rebuild') as rebuild:
+            restarted = DuplicateDetector(self.file_path)
+        rebuild.assert_not_called()
+        self.assertTrue(restarted.is_duplicate(
+            logic.load_expenses()['Food']['items'][-1], 'Food'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from constants import data
+from integrity import IntegrityChecker, month_checksum
+from ledger_stream import iter_events
+
+
+class IntegrityCheckerTest(unittest.TestCase):
+    """
+    Checks and repairs damaged copies of a valid ledger.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'expenses.json')
+        self.ledger = json.loads(json.dumps(data))
+        for month in ('January', 'May', 'June'):
+            items = [{'amount': 4.5, 'description': 'Coffee', 'date': '2025-01-02'},
+                     {'amount': 12.0, 'description': 'Bread'}]
+            self.ledger[month]['money']['Food'] = {'items': items, 'sumOfAmounts': 16.5}
+            self.ledger[month]['totalSum'] = 16.5
+        for details in self.ledger.values():
+            details['checksum'] = month_checksum(details)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, ledger):
+        with open(self.file_path, 'w') as file:
+            json.dump(ledger, file, indent=4)
+
+    def messages(self, problems):
+        return [problem['message'] for problem in problems]
+
+    def test_valid_ledger_is_trusted_after_a_check(self):
+        self.write(self.ledger)
+        checker = IntegrityChecker(self.file_path)
+        self.assertFalse(checker.is_trusted())
+        self.assertTrue(checker.repair())
+        self.assertTrue(checker.is_trusted())
+        self.assertEqual(checker.summary['May']['money']['Food']['count'], 2)
+
+    def test_decoded_and_tokenized_expenses_give_the_same_problems(self):
+        food = self.ledger['May']['money']['Food']
+        food['items'][0]['amount'] = '4.5'
+        food['items'][1]['note'] = {'nested': [1, 2]}
+        food['items'].append([1, 2])
+        del self.ledger['June']['money']['Food']['items'][0]['description']
+        text = json.dumps(self.ledger)
+        results = []
+        for chunk_size in (1, 7, 4096):
+            for decode_depth in (None, 5):
+                checker = IntegrityChecker(self.file_path)
+                checker.scan(iter_events(io.StringIO(text), chunk_size, decode_depth))
+                results.append((checker.problems, checker.summary))
+        self.assertTrue(results[0][0])
+        for result in results[1:]:
+            self.assertEqual(result, results[0])
+
+    def test_repair_restores_a_damaged_ledger(self):
+        damaged = json.loads(json.dumps(self.ledger))
+        del damaged['May']
+        damaged['June']['money']['Food']['sumOfAmounts'] = 99.0
+        del damaged['June']['money']['Food']['items'][1]['description']
+        damaged['January']['money']['Food']['items'][0]['amount'] = 5.0
+        del damaged['March']['budget']
+        self.write(damaged)
+
+        checker = IntegrityChecker(self.file_path)
+        problems = self.messages(checker.check())
+        self.assertIn("The month is missing", problems)
+        self.assertIn("The expenses were changed outside the app", problems)
+        self.assertTrue(checker.repair())
+
+        with open(self.file_path) as file:
+            repaired = json.load(file)
+        self.assertEqual(list(repaired), list(data))
+        self.assertEqual(repaired['June']['money']['Food']['sumOfAmounts'], 16.5)
+        self.assertEqual(repaired['June']['money']['Food']['items'][1]['description'], '')
+        self.assertEqual(repaired['January']['totalSum'], 17.0)
+        self.assertEqual(repaired['March']['budget'], 0.0)
+        self.assertTrue(checker.is_trusted())
+        self.assertEqual(IntegrityChecker(self.file_path).check(force=True), [])
+
+    def test_unrepairable_ledger_is_left_alone(self):
+        self.ledger['May']['money']['Food']['items'][0]['amount'] = 'a lot'
+        self.write(self.ledger)
+        with open(self.file_path, 'rb') as file:
+            content = file.read()
+
+        checker = IntegrityChecker(self.file_path)
+        self.assertFalse(checker.repair())
+        self.assertIn("May/money/Food/items/item/amount is a string, not a number",
+                      self.messages(checker.problems))
+        with open(self.file_path, 'rb') as file:
+            self.assertEqual(file.read(), content)
+
+    def test_invalid_json_is_reported(self):
+        with open(self.file_path, 'w') as file:
+            file.write('{"January": {"money": ')
+        problems = IntegrityChecker(self.file_path).check()
+        self.assertEqual(len(problems), 1)
+        self.assertFalse(problems[0]['repairable'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import io
+import os
+import json
+import random
+import shutil
+import tempfile
+import unittest
+from constants import data
+from ledger_stream import iter_events, iter_ledger, summarise
+
+
+CHUNK_SIZES = (1, 2, 3, 7, 64, 4096)
+
+
+class LedgerStreamTest(unittest.TestCase):
+    """
+    Compares the incremental parser with json.load.
+    """
+
+    def setUp(self):
+        generator = random.Random(0)
+        self.ledger = json.loads(json.dumps(data))
+        for index in range(200):
+            month = generator.choice(list(self.ledger))
+            category = generator.choice(['Fo"od', 'Ho\\me', 'Food'])
+            expense = {'amount': generator.choice([1, 2.5, -3e-5, 1e20, 0, 12.34]),
+                       'description': generator.choice(['a', '{b}', 'c\\"d', 'ü', ']}', '']),
+                       'id': str(index)}
+            if generator.random() < 0.3:
+                expense['date'] = '2025-03-01'
+            if generator.random() < 0.2:
+                expense['extra'] = {'x': [1, {'y': None}], 'z': True}
+            expenses = self.ledger[month]['money'].setdefault(
+                category, {'items': [], 'sumOfAmounts': 0.0})
+            expenses['items'].append(expense)
+            expenses['sumOfAmounts'] += expense['amount']
+            self.ledger[month]['totalSum'] += expense['amount']
+        self.ledger['May']['categoryBudgets'] = {'Food': 150.0}
+
+    def expenses(self, ledger):
+        return [(month, category, expense) for month, details in ledger.items()
+                for category, expenses in details['money'].items()
+                for expense in expenses['items']]
+
+    def test_expenses_match_json_load(self):
+        for indent in (None, 4):
+            text = json.dumps(self.ledger, indent=indent)
+            for chunk_size in CHUNK_SIZES:
+                records = list(iter_ledger(io.StringIO(text), chunk_size))
+                self.assertEqual([record[1:] for record in records if record[0] == 'expense'],
+                                 self.expenses(self.ledger))
+                self.assertIn(('category_budget', 'May', 'Food', 150.0), records)
+                self.assertIn(('month', 'May', 'budget', self.ledger['May']['budget']), records)
+
+    def test_decoded_values_match_the_events(self):
+        text = json.dumps(self.ledger)
+        for chunk_size in CHUNK_SIZES:
+            decoded = {}
+            for path, event, value in iter_events(io.StringIO(text), chunk_size, decode_depth=5):
+                if len(path) == 5 and event == 'value':
+                    decoded.setdefault(path[:3], []).append(value)
+            expected = {}
+            for month, category, expense in self.expenses(self.ledger):
+                expected.setdefault((month, 'money', category), []).append(expense)
+            self.assertEqual(decoded, expected)
+
+    def test_invalid_json_raises(self):
+        for text in ('{"a": [1, 2}', '{"a": {"items": [{"amount": 1,}', '{"a": tru}', '{"a": 1} x'):
+            for chunk_size in (1, 4096):
+                with self.assertRaises(ValueError):
+                    list(iter_events(io.StringIO(text), chunk_size, decode_depth=2))
+
+    def test_summary_sums_the_items(self):
+        directory = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(directory, 'expenses.json')
+            with open(file_path, 'w') as file:
+                json.dump(self.ledger, file, indent=4)
+            summary = summarise(file_path, chunk_size=7)
+        finally:
+            shutil.rmtree(directory)
+        for month, details in self.ledger.items():
+            self.assertAlmostEqual(summary[month]['totalSum'], details['totalSum'])
+            for category, expenses in details['money'].items():
+                self.assertEqual(summary[month]['money'][category]['count'], len(expenses['items']))
+
+
+if __name__ == "__main__":
+    unittest.main()
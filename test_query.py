@@ -0,0 +1,137 @@
+import os
+import json
+import random
+import shutil
+import tempfile
+import unittest
+from constants import data
+from financial_logic import FinancialLogic
+
+
+class QueryTest(unittest.TestCase):
+    """
+    Compares the queries with a brute force filter of the ledger.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, 'expenses.json')
+        self.generator = random.Random(0)
+        ledger = json.loads(json.dumps(data))
+        # Expenses saved before ids were introduced have none
+        for index in range(50):
+            self.add_to(ledger, self.expense(index))
+        with open(self.file_path, 'w') as file:
+            json.dump(ledger, file, indent=4)
+        self.logic = FinancialLogic(file_path=self.file_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def expense(self, index):
+        expense = {'amount': float(self.generator.randint(1, 40)),
+                   'description': self.generator.choice(['Coffee', 'Bread', 'Bus ticket'])}
+        if self.generator.random() < 0.8:
+            expense['date'] = f'2025-{self.generator.randint(1, 3):02d}-{self.generator.randint(1, 28):02d}'
+        return expense
+
+    def add_to(self, ledger, expense):
+        month = self.generator.choice(['January', 'February', 'March'])
+        category = self.generator.choice(['Food', 'Transport'])
+        expenses = ledger[month]['money'].setdefault(category, {'items': [], 'sumOfAmounts': 0.0})
+        expenses['items'].append(expense)
+        expenses['sumOfAmounts'] += expense['amount']
+        ledger[month]['totalSum'] += expense['amount']
+
+    def random_query(self):
+        query = self.logic.query()
+        filters = {}
+        if self.generator.random() < 0.5:
+            filters['months'] = {self.generator.choice(['January', 'February', 'March'])}
+            query.in_months(*filters['months'])
+        if self.generator.random() < 0.5:
+            filters['categories'] = {self.generator.choice(['Food', 'Transport', 'Home'])}
+            query.in_categories(*filters['categories'])
+        if self.generator.random() < 0.5:
+            low = self.generator.randint(0, 30)
+            filters['amounts'] = (low, low + self.generator.randint(0, 20))
+            query.amount_between(*filters['amounts'])
+        if self.generator.random() < 0.3:
+            filters['dates'] = ('2025-01-15', '2025-02-15')
+            query.date_between(*filters['dates'])
+        if self.generator.random() < 0.3:
+            filters['text'] = 'co'
+            query.containing(filters['text'])
+        return query, filters
+
+    def brute_force(self, filters):
+        results = []
+        for month, details in self.logic.load_data().items():
+            for category, expenses in details['money'].items():
+                for expense in expenses['items']:
+                    if 'months' in filters and month not in filters['months']:
+                        continue
+                    if 'categories' in filters and category not in filters['categories']:
+                        continue
+                    if 'amounts' in filters and not \
+                            filters['amounts'][0] <= expense['amount'] <= filters['amounts'][1]:
+                        continue
+                    if 'dates' in filters and not (expense.get('date') and
+                                                   filters['dates'][0] <= expense['date'] <= filters['dates'][1]):
+                        continue
+                    if 'text' in filters and filters['text'] not in expense['description'].lower():
+                        continue
+                    results.append((month, category, expense))
+        return results
+
+    def assert_queries_match(self):
+        def key(result):
+            month, category, expense = result
+            return month, category, json.dumps(expense, sort_keys=True)
+
+        for _ in range(20):
+            query, filters = self.random_query()
+            self.assertEqual(sorted(map(key, query)), sorted(map(key, self.brute_force(filters))))
+
+    def test_queries_follow_changes(self):
+        self.assert_queries_match()
+        for index in range(60):
+            self.logic.current_month = self.generator.choice(['January', 'February', 'March'])
+            category = self.generator.choice(['Food', 'Transport'])
+            items = self.logic.load_expenses().get(category, {'items': []})['items']
+            action = self.generator.random()
+            if action < 0.4 or not items:
+                self.logic.add_expense(float(self.generator.randint(1, 40)), category,
+                                       self.generator.choice(['Coffee', 'Tea']))
+            elif action < 0.7:
+                self.logic.edit_expense(category, self.generator.randrange(len(items)),
+                                        float(self.generator.randint(1, 40)), 'Corn')
+            else:
+                self.logic.delete_expense(category, self.generator.randrange(len(items)))
+            if index % 10 == 0:
+                self.assert_queries_match()
+        self.assert_queries_match()
+
+    def test_sorted_and_limited_results(self):
+        results = list(self.logic.query().order_by('amount', descending=True).limit(5))
+        amounts = sorted((expense['amount'] for _, _, expense in self.brute_force({})), reverse=True)
+        self.assertEqual([expense['amount'] for _, _, expense in results], amounts[:5])
+
+    def test_deleted_expense_leaves_the_index_after_ids_are_assigned(self):
+        self.logic.current_month = 'March'
+        self.logic.add_expense(5.0, 'Food', 'legacy')
+        list(self.logic.query())
+        self.logic.assign_ids()
+        deleted = self.logic.load_expenses()['Food']['items'][0]
+        self.logic.delete_expense('Food', 0)
+        self.assertNotIn(deleted, [expense for _, _, expense in self.logic.query()])
+        self.assert_queries_match()
+
+    def test_query_does_not_write_the_file(self):
+        stamp = os.stat(self.file_path).st_mtime_ns
+        list(self.logic.query().in_categories('Food'))
+        self.assertEqual(os.stat(self.file_path).st_mtime_ns, stamp)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+from unittest import mock
+from constants import data
+from financial_logic import FinancialLogic
+from sync import SyncClient
+from sync_server import SyncServer, SyncRequestHandler
+
+
+class SyncTest(unittest.TestCase):
+    """
+    Runs two devices against an in-process reference server.
+    """
+
+    def setUp(self):
+        handler = type('Handler', (SyncRequestHandler,),
+                       {'server_state': SyncServer()})
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.directory = tempfile.mkdtemp()
+        self.first, self.first_client = self.device('first')
+        self.second, self.second_client = self.device('second')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def device(self, name):
+        """Creates the logic and sync client of a device with its own ledger
+        """
+        os.makedirs(os.path.join(self.directory, name))
+        file_path = os.path.join(self.directory, name, 'expenses.json')
+        with open(file_path, 'w') as file:
+            json.dump(data, file)
+        logic = FinancialLogic(file_path=file_path)
+        logic.current_month = 'March'
+        return logic, SyncClient(logic, self.url)
+
+    def items(self, logic, category='Food'):
+        return [(expense['description'], expense['amount'])
+                for expense in logic.load_expenses().get(category, {'items': []})['items']]
+
+    def test_changes_reach_the_other_device(self):
+        self.first.add_expense(10.0, 'Food', 'bread')
+        self.first.add_expense(20.0, 'Food', 'milk')
+        self.first.set_budget(500.0)
+        self.assertEqual(self.first_client.sync(), (0, 3))
+
+        self.assertEqual(self.second_client.sync(), (3, 0))
+        self.assertEqual(self.items(self.second), [('bread', 10.0), ('milk', 20.0)])
+        self.assertEqual(self.second.load_data()['March']['totalSum'], 30.0)
+        self.assertEqual(self.second.load_data()['March']['budget'], 500.0)
+
+        self.second.delete_expense('Food', 0)
+        self.second_client.sync()
+        self.first_client.sync()
+        self.assertEqual(self.items(self.first), [('milk', 20.0)])
+
+    def test_pull_saves_the_ledger_once(self):
+        for index in range(5):
+            self.first.add_expense(float(index), 'Food', f'item {index}')
+        self.first_client.sync()
+
+        with mock.patch.object(self.second, 'write_data',
+                               wraps=self.second.write_data) as write_data:
+            self.assertEqual(self.second_client.sync(), (5, 0))
+        self.assertEqual(write_data.call_count, 1)
+        self.assertEqual(len(self.items(self.second)), 5)
+
+    def test_later_concurrent_edit_wins_on_both_devices(self):
+        self.first.add_expense(10.0, 'Food', 'bread')
+        self.first_client.sync()
+        self.second_client.sync()
+
+        # Both edits have the same version, the later one wins
+        self.first.edit_expense('Food', 0, 11.0, 'bread first')
+        self.second.edit_expense('Food', 0, 12.0, 'bread second')
+        self.second_client.outbox[next(iter(self.second_client.outbox))]['updated'] = '9999'
+        self.first_client.sync()
+        self.assertEqual(self.second_client.sync(), (0, 1))
+        self.first_client.sync()
+
+        self.assertEqual(self.items(self.first), [('bread second', 12.0)])
+        self.assertEqual(self.items(self.second), [('bread second', 12.0)])
+
+    def test_checkpoint_keeps_pulled_changes(self):
+        self.second.add_expense(1.0, 'Food', 'bread')
+        self.second.create_checkpoint('before')
+        self.first.add_expense(2.0, 'Food', 'remote milk')
+        self.first_client.sync()
+        self.second_client.sync()
+        self.second.create_checkpoint('after')
+        self.second.add_expense(3.0, 'Food', 'eggs')
+
+        self.second.restore_checkpoint('after')
+        self.assertEqual(self.items(self.second), [('bread', 1.0), ('remote milk', 2.0)])
+
+    def test_local_changes_survive_a_restart(self):
+        self.first.add_expense(10.0, 'Food', 'bread')
+        restarted = SyncClient(FinancialLogic(file_path=self.first.file_path), self.url)
+        self.assertEqual(restarted.sync(), (0, 1))
+        self.second_client.sync()
+        self.assertEqual(self.items(self.second), [('bread', 10.0)])
+
+    def test_changes_before_the_first_sync_are_not_journaled(self):
+        self.first.add_expense(10.0, 'Food', 'bread')
+        self.assertFalse(os.path.exists(self.first_client.journal_path))
+        self.assertEqual(self.first_client.sync(), (0, 1))
+
+    def test_sync_saves_only_the_changed_versions(self):
+        for index in range(5):
+            self.first.add_expense(float(index), 'Food', f'item {index}')
+        self.first_client.sync()
+        self.first.add_expense(6.0, 'Food', 'one more')
+        self.assertTrue(os.path.exists(self.first_client.journal_path))
+        self.first_client.sync()
+
+        self.assertFalse(os.path.exists(self.first_client.journal_path))
+        with open(self.first_client.state_path) as file:
+            self.assertNotIn('versions', json.load(file))
+        with open(self.first_client.versions_path) as file:
+            lines = [json.loads(line) for line in file]
+        self.assertEqual(len(lines[-1]), 1)
+        restarted = SyncClient(FinancialLogic(file_path=self.first.file_path), self.url)
+        self.assertEqual(restarted.versions, self.first_client.versions)
+
+
+if __name__ == "__main__":
+    unittest.main()